@@ -1,4 +1,7 @@
-import pygame, pathlib
+import pygame, pathlib, struct, hashlib, json, os, mmap, threading, time
+from collections import OrderedDict
+from collections.abc import Mapping
+from functools import lru_cache
 from settings import WIDTH, HEIGHT
 
 TILE = 8
@@ -8,59 +11,330 @@ BULLET_SCALE = 6
 HEART_SCALE = 7
 
 ROOT = pathlib.Path(__file__).parents[1] / "assets" / "SpaceShooterAssets"
+CACHE_FILE = ROOT.parent / ".cache" / "sprites.bin"
+CACHE_VERSION = 1
+
+SHIPS = "SpaceShooterAssetPack_Ships.png"
+
+# receitas de todos os sprites: ("sheet", arquivo, recorte, escala, rotacao),
+# ("full", arquivo, escala) ou ("bg", arquivo)
+SPRITES = {
+    "SHIP_LEFT":  ("sheet", SHIPS, (0, 8, 8, 8), SHIP_SCALE, 0),
+    "SHIP_IDLE":  ("sheet", SHIPS, (8, 8, 8, 8), SHIP_SCALE, 0),
+    "SHIP_RIGHT": ("sheet", SHIPS, (16, 8, 8, 8), SHIP_SCALE, 0),
+
+    "CANNON_down":  ("sheet", SHIPS, (56, 40, 8, 8), SHIP_SCALE, 0),
+    "CANNON_left":  ("sheet", SHIPS, (56, 40, 8, 8), SHIP_SCALE, -90),
+    "CANNON_up":    ("sheet", SHIPS, (56, 40, 8, 8), SHIP_SCALE, 180),
+    "CANNON_right": ("sheet", SHIPS, (56, 40, 8, 8), SHIP_SCALE, 90),
+
+    "DESTROYED_CANNON_down":  ("sheet", SHIPS, (64, 16, 8, 8), SHIP_SCALE, 0),
+    "DESTROYED_CANNON_left":  ("sheet", SHIPS, (64, 16, 8, 8), SHIP_SCALE, -90),
+    "DESTROYED_CANNON_up":    ("sheet", SHIPS, (64, 16, 8, 8), SHIP_SCALE, 180),
+    "DESTROYED_CANNON_right": ("sheet", SHIPS, (64, 16, 8, 8), SHIP_SCALE, 90),
+
+    "BULLET_up":    ("full", "projectile_up.png", BULLET_SCALE),
+    "BULLET_down":  ("full", "projectile_down.png", BULLET_SCALE),
+    "BULLET_left":  ("full", "projectile_left.png", BULLET_SCALE),
+    "BULLET_right": ("full", "projectile_right.png", BULLET_SCALE),
+
+    "ACTIVE_TARGET": ("full", "target_alive.png", TARGET_SCALE),
+    "DESTROYED_TGT": ("full", "target_dead.png", TARGET_SCALE),
+    "HEART":         ("full", "heart.png", HEART_SCALE),
+
+    "POWERUP_powerups1": ("sheet", "powerups.png", (56, 0, 8, 8), SHIP_SCALE, 0),
+    "POWERUP_powerups2": ("sheet", "powerups.png", (64, 0, 8, 8), SHIP_SCALE, 0),
+
+    "LOGO":       ("full", "logo.png", 5),
+    "BACKGROUND": ("bg", "background.png"),
+}
+
+FONTS = {
+    "FONT_BIG": 64,
+    "FONT_MID": 48,
+    "FONT_SMALL": 32,
+    "FONT_TINY": 20,
+}
+
+# sem janela (simulacao headless) os sprites viram superficies vazias do mesmo tamanho
+def headless():
+    return pygame.display.get_surface() is None
+
+def png_size(path):
+    with open(path, "rb") as f:
+        return struct.unpack(">II", f.read(24)[16:24])
+
+@lru_cache(maxsize=None)
+def load_sheet(filename, alpha=True):
+    img = pygame.image.load(ROOT / filename)
+    return img.convert_alpha() if alpha else img.convert()
 
 def load_img(sheet, rect, scale):
-    surf = pygame.image.load(ROOT / sheet).convert_alpha()
     x, y, w, h = rect
-    return pygame.transform.scale(surf.subsurface((x, y, w, h)),
+    if headless():
+        return pygame.Surface((w*scale, h*scale))
+    return pygame.transform.scale(load_sheet(sheet).subsurface((x, y, w, h)),
                                   (w*scale, h*scale))
 
 def load_full_img(filename, scale):
-    img = pygame.image.load(ROOT / filename).convert_alpha()
+    if headless():
+        w, h = png_size(ROOT / filename)
+        return pygame.Surface((w*scale, h*scale))
+    img = load_sheet(filename)
     return pygame.transform.scale(img, (img.get_width()*scale, img.get_height()*scale))
 
-def load_bg():
-    bg = pygame.image.load(ROOT / "background.png").convert()
-    return pygame.transform.scale(bg, (WIDTH, HEIGHT))
+def build_sprite(spec):
+    kind, filename, *args = spec
+    if kind == "sheet":
+        rect, scale, angle = args
+        img = load_img(filename, rect, scale)
+        return pygame.transform.rotate(img, angle) if angle else img
+    if kind == "full":
+        return load_full_img(filename, *args)
+    if headless():
+        return pygame.Surface((WIDTH, HEIGHT))
+    return pygame.transform.scale(load_sheet(filename, alpha=False), (WIDTH, HEIGHT))
 
+def cache_key():
+    h = hashlib.sha1(repr((CACHE_VERSION, WIDTH, HEIGHT, sorted(SPRITES.items()))).encode())
+    for filename in sorted({spec[1] for spec in SPRITES.values()}):
+        h.update(filename.encode())
+        h.update(hashlib.sha1((ROOT / filename).read_bytes()).digest())
+    return h.hexdigest()
 
-SHIP_LEFT  = load_img("SpaceShooterAssetPack_Ships.png", (0, 8, 8, 8),  SHIP_SCALE)
-SHIP_IDLE  = load_img("SpaceShooterAssetPack_Ships.png", (8, 8, 8, 8),  SHIP_SCALE)
-SHIP_RIGHT = load_img("SpaceShooterAssetPack_Ships.png", (16, 8, 8, 8), SHIP_SCALE)
+# atlas pre-processado: cabecalho json (chave + indice) seguido dos pixels crus
+def open_baked(key, path=CACHE_FILE):
+    try:
+        with open(path, "rb") as f:
+            data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        size, = struct.unpack("<I", data[:4])
+        header = json.loads(data[4:4 + size])
+    except (OSError, ValueError, struct.error):
+        return None
+    if header.get("key") != key or set(header["sprites"]) != set(SPRITES):
+        data.close()
+        return None
+    return header["sprites"], memoryview(data)[4 + size:]
 
-base_cannon = load_img("SpaceShooterAssetPack_Ships.png", (56,40,8,8), SHIP_SCALE) 
+def decode_baked(entry, pixels):
+    fmt, w, h, offset, length = entry
+    img = pygame.image.frombuffer(pixels[offset:offset + length], (w, h), fmt)
+    return img.convert_alpha() if fmt == "RGBA" else img.convert()
 
-CANNON_IMGS = {
-    "down": base_cannon,
-    "left": pygame.transform.rotate(base_cannon, -90),
-    "up": pygame.transform.rotate(base_cannon, 180),
-    "right": pygame.transform.rotate(base_cannon, 90),
-}
+def write_baked(key, sprites, path=CACHE_FILE):
+    index, blobs, offset = {}, [], 0
+    for name, img in sprites.items():
+        fmt = "RGB" if SPRITES[name][0] == "bg" else "RGBA"
+        raw = pygame.image.tobytes(img, fmt)
+        index[name] = (fmt, img.get_width(), img.get_height(), offset, len(raw))
+        blobs.append(raw)
+        offset += len(raw)
+    header = json.dumps({"key": key, "sprites": index}).encode()
+    tmp = path.with_suffix(".tmp")
+    try:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp.write_bytes(struct.pack("<I", len(header)) + header + b"".join(blobs))
+        os.replace(tmp, path)
+    except OSError:
+        pass
 
-base_destroyed_cannon = load_img("SpaceShooterAssetPack_Ships.png", (64, 16, 8, 8), SHIP_SCALE)
 
-DESTROYED_CANNON_IMGS = {
-    "down": base_destroyed_cannon,
-    "left": pygame.transform.rotate(base_destroyed_cannon, -90),
-    "up": pygame.transform.rotate(base_destroyed_cannon, 180),
-    "right": pygame.transform.rotate(base_destroyed_cannon, 90),
-}
+class AssetRegistry:
+    # carrega cada sprite/fonte so no primeiro acesso e mede quanto custou
+    def __init__(self, sprites=SPRITES, fonts=FONTS):
+        self.sprites = sprites
+        self.fonts = fonts
+        self.load_times: dict[str, float] = {}
+        self.touched: set[str] = set()
+        self._assets: dict[str, object] = {}
+        self._placeholders: dict[str, pygame.Surface] = {}
+        self._baked = None
+        # o prefetch de fases tambem pede sprites: carga e placeholders sob trava
+        self._lock = threading.Lock()
 
-BULLET_IMGS = {
-    "up": load_full_img("projectile_up.png", BULLET_SCALE),
-    "down": load_full_img("projectile_down.png", BULLET_SCALE), 
-    "left": load_full_img("projectile_left.png", BULLET_SCALE), 
-    "right": load_full_img("projectile_right.png", BULLET_SCALE) 
-}
+    def __contains__(self, name): return name in self.sprites or name in self.fonts
 
+    def __getitem__(self, name):
+        asset = self._assets.get(name)
+        if asset is None:
+            with self._lock:
+                if name in self.sprites and headless():
+                    if name not in self._placeholders:
+                        self._placeholders[name] = build_sprite(self.sprites[name])
+                    return self._placeholders[name]
+                asset = self._assets.get(name)
+                if asset is None:
+                    asset = self._load(name)
+        if name not in self.touched:
+            self.touched.add(name)
+        return asset
 
-ACTIVE_TARGET  = load_full_img("target_alive.png",  TARGET_SCALE)
-DESTROYED_TGT  = load_full_img("target_dead.png", TARGET_SCALE)
-HEART = load_full_img("heart.png", HEART_SCALE)
+    def preload(self, names):
+        # decodifica no thread principal sem contar como usado no relatorio
+        if headless():
+            return
+        with self._lock:
+            for name in names:
+                if name not in self._assets:
+                    self._load(name)
 
-POWERUPS = {
-    "powerups1": load_img("powerups.png", (56, 0, 8, 8),  SHIP_SCALE).convert_alpha(),
-    "powerups2": load_img("powerups.png", (64, 0, 8, 8),  SHIP_SCALE).convert_alpha()
-}
+    def _load(self, name):
+        if name not in self:
+            raise KeyError(name)
+        start = time.perf_counter()
+        if name in self.fonts:
+            asset = pygame.font.Font(None, self.fonts[name])
+        else:
+            if self._baked is None:
+                key = cache_key()
+                self._baked = open_baked(key) or self._bake(key)
+            asset = self._assets.get(name)
+            if asset is None:
+                index, pixels = self._baked
+                asset = decode_baked(index[name], pixels)
+        self._assets[name] = asset
+        self.load_times.setdefault(name, time.perf_counter() - start)
+        return asset
+
+    def _bake(self, key):
+        # cache ausente ou desatualizado: gera todas as variantes de uma vez
+        for name, spec in self.sprites.items():
+            start = time.perf_counter()
+            self._assets[name] = build_sprite(spec)
+            self.load_times[name] = time.perf_counter() - start
+        write_baked(key, {n: self._assets[n] for n in self.sprites})
+        load_sheet.cache_clear()
+        return {}, None
+
+    def untouched(self) -> list[str]:
+        return [n for n in (*self.sprites, *self.fonts) if n not in self.touched]
+
+    def report(self) -> str:
+        lines = [f"{name:<24} {secs * 1000:7.2f} ms" for name, secs in
+                 sorted(self.load_times.items(), key=lambda kv: -kv[1])]
+        lines.append(f"total {sum(self.load_times.values()) * 1000:.2f} ms")
+        lines.append("never touched: " + (", ".join(self.untouched()) or "-"))
+        return "\n".join(lines)
+
+
+class SpriteGroup(Mapping):
+    def __init__(self, names: dict[str, str]):
+        self.names = names
+
+    def __getitem__(self, key): return REGISTRY[self.names[key]]
+
+    # sem carregar o sprite (o __contains__ do Mapping chamaria __getitem__)
+    def __contains__(self, key): return key in self.names
+
+    def __iter__(self): return iter(self.names)
+
+    def __len__(self): return len(self.names)
+
+
+class LazyFont:
+    def __init__(self, name: str):
+        self.name = name
+
+    def __getattr__(self, attr):
+        return getattr(REGISTRY[self.name], attr)
+
+
+REGISTRY = AssetRegistry()
+
+
+# ---- rotacoes em angulo livre ----
+
+# angulos de tela em graus, sentido horario a partir da direita (y cresce pra
+# baixo): 0 direita, 90 baixo, 180 esquerda, 270 cima. Quantizados em passos de
+# 360/ANGLE_STEPS, entao 8, 16, 32 e 64 direcoes caem em passos exatos
+ANGLE_STEPS = 256
+CARDINALS = {0: "right", 64: "down", 128: "left", 192: "up"}
+TRANSFORM_BUDGET = 8 << 20     # bytes de superficies transformadas guardadas
+
+def quantize(angle: float) -> int:
+    return round(angle * ANGLE_STEPS / 360) % ANGLE_STEPS
+
+def step_angle(step: int) -> float:
+    return step * 360 / ANGLE_STEPS
+
+class TransformCache:
+    # sprites girados/escalados por (nome, passo do angulo, escala), calculados
+    # uma vez e compartilhados por todas as entidades. A rotacao e anti-horaria
+    # como em pygame.transform.rotate. Passou do orcamento, sai o menos usado
+    def __init__(self, budget: int = TRANSFORM_BUDGET, registry: AssetRegistry | None = None):
+        self.budget = budget
+        self.registry = registry
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._cache: OrderedDict[tuple, tuple[pygame.Surface, pygame.Surface]] = OrderedDict()
+        self._lock = threading.Lock()     # canhoes em angulo tambem nascem no prefetch
+
+    def __len__(self): return len(self._cache)
+
+    def get(self, name: str, step: int, scale: float = 1) -> pygame.Surface:
+        with self._lock:
+            return self._get(name, step, scale)
+
+    def _get(self, name, step, scale):
+        key = (name, step % ANGLE_STEPS, scale)
+        base = (self.registry or REGISTRY)[name]
+        entry = self._cache.get(key)
+        # a base muda quando a janela abre (placeholder -> sprite de verdade)
+        if entry is not None and entry[0] is base:
+            self._cache.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+        self.misses += 1
+        img = pygame.transform.rotate(base, step_angle(key[1])) if key[1] else base
+        if scale != 1:
+            img = pygame.transform.scale(img, (round(img.get_width() * scale), round(img.get_height() * scale)))
+        if entry is not None:
+            self.bytes -= _surface_bytes(entry[1])
+        self._cache[key] = (base, img)
+        self._cache.move_to_end(key)
+        self.bytes += _surface_bytes(img)
+        while self.bytes > self.budget and len(self._cache) > 1:
+            _, (_, old) = self._cache.popitem(last=False)
+            self.bytes -= _surface_bytes(old)
+            self.evictions += 1
+        return img
+
+    def clear(self):
+        with self._lock:
+            self._cache.clear()
+            self.bytes = 0
+
+    def stats(self) -> dict:
+        return {"entries": len(self._cache), "bytes": self.bytes, "budget": self.budget,
+                "hits": self.hits, "misses": self.misses, "evictions": self.evictions}
+
+def _surface_bytes(img: pygame.Surface) -> int:
+    return img.get_width() * img.get_height() * img.get_bytesize()
+
+TRANSFORMS = TransformCache()
+
+def rotated(name: str, step: int, scale: float = 1) -> pygame.Surface:
+    return TRANSFORMS.get(name, step, scale)
+
+def load_bg():
+    return REGISTRY["BACKGROUND"]
+
+def __getattr__(name):
+    if name not in REGISTRY:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    asset = REGISTRY[name]
+    if not headless():
+        globals()[name] = asset
+    return asset
+
+ORIENTATIONS = ("down", "left", "up", "right")
+
+CANNON_IMGS = SpriteGroup({d: f"CANNON_{d}" for d in ORIENTATIONS})
+
+DESTROYED_CANNON_IMGS = SpriteGroup({d: f"DESTROYED_CANNON_{d}" for d in ORIENTATIONS})
+
+BULLET_IMGS = SpriteGroup({d: f"BULLET_{d}" for d in ORIENTATIONS})
 
-LOGO = load_full_img("logo.png", 5)
\ No newline at end of file
+POWERUPS = SpriteGroup({k: f"POWERUP_{k}" for k in ("powerups1", "powerups2")})
@@ -0,0 +1,196 @@
+import argparse, json, os, pathlib, platform, random, sys, tempfile, time, tracemalloc
+
+import pygame
+
+from settings import WIDTH, HEIGHT
+
+BASELINE = pathlib.Path("benchmarks") / "baseline.json"
+FRAMES = 1000
+THRESHOLD = 0.15     # piora relativa tolerada antes de falhar
+FIRE_EVERY = 6       # frames entre tiros do piloto automatico
+REPEAT = 3           # rodadas por cenario; vale a mais rapida (menos ruido)
+
+# (alvos moveis, canhoes, power-ups[, direcoes dos canhoes em angulo livre])
+SCENARIOS = {
+    "base":     (5, 0, 1),
+    "targets":  (80, 0, 0),
+    "cannons":  (10, 24, 0),
+    "powerups": (10, 0, 40),
+    "mixed":    (60, 16, 24),
+    "angles":   (10, 24, 0, 16),
+}
+
+
+def stress_level(targets: int, cannons: int, powerups: int, seed: int = 0, ways: int = 0) -> dict:
+    # fase sintetica no mesmo formato de levels/*.json
+    rng = random.Random(seed)
+
+    def moving(w, h):
+        x0, y0 = rng.randrange(0, WIDTH - w), rng.randrange(60, 420)
+        x1, y1 = rng.randrange(0, WIDTH - w), rng.randrange(60, 420)
+        return {"x": x0, "y": y0,
+                "movement": {"start": [x0, y0], "end": [x1, y1], "speed": round(rng.uniform(0.01, 0.05), 3)}}
+
+    def direction():
+        if ways:
+            return rng.randrange(ways) * 360 / ways
+        return rng.choice(["down", "left", "right"])
+
+    return {
+        "background_rect": [128, 0, 128, 128],
+        "targets": [moving(48, 48) for _ in range(targets)],
+        "cannons": [{"x": rng.randrange(0, WIDTH - 64), "y": rng.randrange(40, 360),
+                     "direction": direction()} for _ in range(cannons)],
+        "powerups": [dict(moving(64, 64), type=rng.choice(["ammo", "hp"]), value=1) for _ in range(powerups)],
+        "ammo": 100_000,
+    }
+
+
+class _Manager:
+    # faz o papel do StateManager: so anota pra onde o PlayState quis ir
+    def __init__(self):
+        self.changed = None
+
+    def change(self, state_id, data=None):
+        self.changed = state_id
+
+
+def _pool(play, pool: dict):
+    # vagas de bala usadas e arrays alocados pelos pools da jogada
+    for store in (play.sim.bullets, play.sim.enemy_bullets):
+        pool["slots"] = max(pool["slots"], store.high_water)
+        pool["allocs"] += store.allocations
+
+
+def _play(states, frames: int, surf: pygame.Surface) -> tuple[list[int], dict]:
+    mgr = _Manager()
+    pool = {"slots": 0, "allocs": 0}
+    play = states.PlayState(mgr, {"level": 0})
+    held = {pygame.K_LEFT: False, pygame.K_RIGHT: False}
+    pygame.key.get_pressed = lambda: held
+    fire = pygame.event.Event(pygame.KEYDOWN, key=pygame.K_SPACE, unicode=" ")
+    times = []
+    for f in range(frames):
+        # a nave varre a tela de um lado pro outro atirando
+        held[pygame.K_LEFT] = (f // 90) % 2 == 1
+        held[pygame.K_RIGHT] = not held[pygame.K_LEFT]
+        start = time.perf_counter_ns()
+        if f % FIRE_EVERY == 0:
+            play.handle_event(fire)
+        if mgr.changed is None:
+            play.update(1 / 30)
+        play.draw(surf)
+        times.append(time.perf_counter_ns() - start)
+        if mgr.changed is not None:
+            mgr.changed = None
+            _pool(play, pool)
+            play = states.PlayState(mgr, {"level": 0})
+    _pool(play, pool)
+    return times, pool
+
+
+def run_scenario(counts, frames: int = FRAMES, seed: int = 0, repeat: int = REPEAT) -> dict:
+    from core import states
+    from core.level import LevelManager
+    from core.replay import RECORDER
+    from core.score import ScoreManager
+    from core.telemetry import TELEMETRY
+
+    surf = pygame.Surface((WIDTH, HEIGHT))
+    saved = (states.level_manager, pygame.key.get_pressed, RECORDER.enabled, TELEMETRY.enabled,
+             set(states.PlayState.collected_hp_levels), ScoreManager.not_used_bullets)
+    with tempfile.TemporaryDirectory() as tmp:
+        path = pathlib.Path(tmp) / "1.json"
+        path.write_text(json.dumps(stress_level(*counts[:3], seed=seed, ways=counts[3] if len(counts) > 3 else 0)))
+        states.level_manager = LevelManager(pathlib.Path(tmp))
+        RECORDER.enabled = TELEMETRY.enabled = False
+        try:
+            _play(states, min(frames, 60), surf)          # aquecimento
+            times, pool = min((_play(states, frames, surf) for _ in range(repeat)), key=lambda r: sum(r[0]))
+            tracemalloc.start()
+            _play(states, min(frames, 300), surf)
+            peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+        finally:
+            (states.level_manager, pygame.key.get_pressed, RECORDER.enabled, TELEMETRY.enabled,
+             hp_levels, ScoreManager.not_used_bullets) = saved
+            states.PlayState.collected_hp_levels.clear()
+            states.PlayState.collected_hp_levels.update(hp_levels)
+
+    ordered = sorted(times)
+    total = sum(times) / 1e9
+    pick = lambda q: ordered[min(len(ordered) - 1, len(ordered) * q // 100)] / 1e6
+    return {"targets": counts[0], "cannons": counts[1], "powerups": counts[2], "frames": frames,
+            "fps": round(frames / total, 1), "p50_ms": round(pick(50), 3),
+            "p99_ms": round(pick(99), 3), "peak_kb": round(peak / 1024, 1),
+            "bullet_slots": pool["slots"], "pool_allocs": pool["allocs"]}
+
+
+def compare(results: dict, baseline: dict, threshold: float = THRESHOLD) -> list[str]:
+    problems = []
+    for name, r in results.items():
+        base = baseline.get("scenarios", {}).get(name)
+        if base is None:
+            continue
+        if r["fps"] < base["fps"] * (1 - threshold):
+            problems.append(f"{name}: fps {r['fps']} < {base['fps']}")
+        for key in ("p99_ms", "peak_kb"):
+            if r[key] > base[key] * (1 + threshold):
+                problems.append(f"{name}: {key} {r[key]} > {base[key]}")
+    return problems
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="benchmark do PlayState com fases sinteticas")
+    parser.add_argument("-n", "--frames", type=int, default=FRAMES)
+    parser.add_argument("-s", "--scenario", action="append", choices=sorted(SCENARIOS),
+                        help="repetivel; padrao: todos")
+    parser.add_argument("--custom", metavar="N,M,K[,D]",
+                        help="alvos,canhoes,power-ups[,direcoes dos canhoes] de um cenario extra")
+    parser.add_argument("--baseline", type=pathlib.Path, default=BASELINE)
+    parser.add_argument("--save", action="store_true", help="grava os resultados como baseline")
+    parser.add_argument("--print", dest="print_only", action="store_true",
+                        help="so mostra os resultados em JSON, sem comparar com o baseline")
+    parser.add_argument("--threshold", type=float, default=THRESHOLD)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--repeat", type=int, default=REPEAT)
+    args = parser.parse_args(argv)
+
+    # janela de verdade so pra carregar os sprites; o desenho vai pra uma Surface
+    os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+    pygame.init()
+    pygame.display.set_mode((1, 1))
+
+    scenarios = {name: SCENARIOS[name] for name in (args.scenario or SCENARIOS)}
+    if args.custom:
+        scenarios["custom"] = tuple(int(v) for v in args.custom.split(","))
+
+    results = {}
+    for name, counts in scenarios.items():
+        r = results[name] = run_scenario(counts, args.frames, args.seed, args.repeat)
+        print(f"{name:<10} {r['fps']:9.1f} fps  p50 {r['p50_ms']:6.3f} ms  "
+              f"p99 {r['p99_ms']:6.3f} ms  pico {r['peak_kb']:8.1f} KB  "
+              f"balas {r['bullet_slots']:4d} vagas / {r['pool_allocs']} alocacoes")
+
+    report = {"python": platform.python_version(), "pygame": pygame.version.ver,
+              "machine": platform.machine(), "frames": args.frames, "scenarios": results}
+    if args.save:
+        args.baseline.parent.mkdir(parents=True, exist_ok=True)
+        args.baseline.write_text(json.dumps(report, indent=2))
+        print(f"baseline gravado em {args.baseline}")
+        return 0
+    if args.print_only:
+        print(json.dumps(report, indent=2))
+        return 0
+    if not args.baseline.exists():
+        # sem baseline o gate nao mede nada: falha em vez de passar calado
+        print(f"baseline {args.baseline} nao existe: rode com --save na maquina de referencia")
+        return 2
+
+    problems = compare(results, json.loads(args.baseline.read_text()), args.threshold)
+    for p in problems:
+        print("REGRESSAO", p)
+    return 1 if problems else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,35 +1,188 @@
-from core.assets import BULLET_IMGS
+import math
+import numpy as np
+import pygame
+
+from core.assets import BULLET_IMGS, quantize, rotated
 from settings import WIDTH, HEIGHT
 
-class Bullet:
-    def __init__(self, x, y, dx=0, dy=-1, speed = 16, source = "player"): 
-        self.speed = speed
-        self.dx, self.dy = dx, dy
-        self.active = True
-        self.source = source
-
-        if dx == 0 and dy < 0:
-            self.direction = "up"
-        elif dx == 0 and dy > 0:
-            self.direction = "down"
-        elif dx < 0 and dy == 0:
-            self.direction = "left"
-        elif dx > 0 and dy == 0:
-            self.direction = "right"
+DIRECTIONS = ("up", "down", "left", "right")
+SOURCES = ("player", "cannon")
+
+def direction_of(dx, dy):
+    if dx == 0 and dy < 0:
+        return "up"
+    elif dx == 0 and dy > 0:
+        return "down"
+    elif dx < 0 and dy == 0:
+        return "left"
+    elif dx > 0 and dy == 0:
+        return "right"
+    return "up"
+
+def bullet_image(dx, dy) -> tuple[int, pygame.Surface]:
+    # (codigo, sprite) da bala indo em (dx, dy): 0..3 sao os indices de
+    # DIRECTIONS; em diagonal e 4 + passo do angulo, com o sprite da direita girado
+    if dx and dy:
+        step = quantize(math.degrees(math.atan2(dy, dx)))
+        return len(DIRECTIONS) + step, rotated("BULLET_right", -step)
+    d = direction_of(dx, dy)
+    return DIRECTIONS.index(d), BULLET_IMGS[d]
+
+class BulletStore:
+    # projeteis em struct-of-arrays: so as primeiras n posicoes sao validas.
+    # pos e o canto superior esquerdo do rect, vel ja vem multiplicada pela velocidade;
+    # dir e o codigo de bullet_image.
+    # Funciona como pool: as vagas de n em diante sao a lista livre (a compactacao
+    # mantem as vivas contiguas) e nada e alocado por bala depois do aquecimento
+    FIELDS = (("pos", np.float64, 2), ("vel", np.float64, 2), ("size", np.int64, 2),
+              ("dir", np.int16, 1), ("src", np.int8, 1), ("active", np.bool_, 1))
+    LIMITS = np.array([WIDTH, HEIGHT])
+
+    def __init__(self, capacity: int = 64):
+        self.n = 0
+        self.capacity = 0
+        # contadores do pool
+        self.high_water = 0
+        self.spawned = 0
+        self.reused = 0
+        self.allocations = 0
+        self._alloc(capacity)
+        self._empty = np.zeros((0, 2), np.int64)
+
+    def __len__(self): return self.n
+
+    def copy(self) -> "BulletStore":
+        new = BulletStore.__new__(BulletStore)
+        new.__dict__.update(self.__dict__)
+        for name, _, _ in self.FIELDS:
+            setattr(new, name, getattr(self, name).copy())
+        new._scratch = {name: arr.copy() for name, arr in self._scratch.items()}
+        new._inside, new._below = self._inside.copy(), self._below.copy()
+        return new
+
+    def _alloc(self, capacity: int):
+        # (re)aloca os campos e os rascunhos de advance/compact, que assim nao alocam
+        for name, dtype, width in self.FIELDS:
+            arr = np.zeros((capacity, width) if width > 1 else capacity, dtype)
+            old = getattr(self, name, None)
+            if old is not None:
+                arr[:self.n] = old[:self.n]
+            setattr(self, name, arr)
+        self._scratch = {name: np.empty_like(getattr(self, name)) for name, _, _ in self.FIELDS}
+        self._inside = np.empty((capacity, 2), np.bool_)
+        self._below = np.empty((capacity, 2), np.bool_)
+        self.capacity = capacity
+        self.allocations += 1
+
+    def _grow(self):
+        self._alloc(self.capacity * 2)
+
+    def stats(self) -> dict:
+        return {"live": self.n, "capacity": self.capacity, "high_water": self.high_water,
+                "spawned": self.spawned, "reused": self.reused, "allocations": self.allocations}
+
+    def spawn(self, x, y, dx=0, dy=-1, speed=16, source="player") -> int:
+        if self.n == self.capacity:
+            self._grow()
+        i = self.n
+        code, img = bullet_image(dx, dy)
+        w, h = img.get_size()
+        self.pos[i] = x - w // 2, y - h // 2
+        self.vel[i] = dx * speed, dy * speed
+        self.size[i] = w, h
+        self.dir[i] = code
+        self.src[i] = SOURCES.index(source)
+        self.active[i] = True
+        self.n += 1
+        self.spawned += 1
+        if i < self.high_water:
+            self.reused += 1
         else:
-            self.direction = "up" 
+            self.high_water = self.n
+        return i
 
-        self.image = BULLET_IMGS[self.direction]
-        self.rect = self.image.get_rect(center=(x, y))
+    def advance(self, frames: int = 1):
+        # nas quatro direcoes posicoes e velocidades sao inteiras, entao
+        # pos + vel * frames e exato; com bala em diagonal soma passo a passo
+        # pra dar o mesmo arredondamento de `frames` chamadas
+        n = self.n
+        if not n:
+            return
+        pos, vel = self.pos[:n], self.vel[:n]
+        if frames == 1:
+            pos += vel
+        elif self.diagonal():
+            for _ in range(frames):
+                pos += vel
+        else:
+            pos += vel * frames
+        # dentro da tela: pos + size >= 0 e pos <= LIMITS, nos rascunhos
+        tmp, inside, ok = self._scratch["pos"][:n], self._inside[:n], self._below[:n]
+        np.add(pos, self.size[:n], out=tmp)
+        np.greater_equal(tmp, 0, out=inside)
+        np.less_equal(pos, self.LIMITS, out=ok)
+        inside &= ok
+        np.logical_and(inside[:, 0], inside[:, 1], out=ok[:, 0])
+        self.active[:n] &= ok[:, 0]
 
-    def update(self):
-        self.rect.x += self.dx * self.speed
-        self.rect.y += self.dy * self.speed 
+    def diagonal(self) -> bool:
+        return bool(self.n) and int(self.dir[:self.n].max()) >= len(DIRECTIONS)
 
-        if (self.rect.right < 0 or self.rect.left > WIDTH or
-            self.rect.bottom < 0 or self.rect.top > HEIGHT):
-            self.active = False
+    def compact(self):
+        # no lugar: as vivas vao pro comeco via rascunho, sem arrays novos
+        n = self.n
+        keep = self.active[:n]
+        if keep.all():
+            return
+        k = int(np.count_nonzero(keep))
+        # active e o ultimo campo, entao keep continua valido ate o fim do laco
+        for name, _, _ in self.FIELDS:
+            arr, tmp = getattr(self, name), self._scratch[name]
+            np.compress(keep, arr[:n], axis=0, out=tmp[:k])
+            arr[:k] = tmp[:k]
+        self.n = k
 
-    def draw(self, surf):
-        surf.blit(self.image, self.rect)
+    def bounds(self):
+        # cantos (n, 2) inteiros: superior esquerdo e inferior direito
+        n = self.n
+        if not n:
+            return self._empty, self._empty
+        lt = self.pos[:n].astype(np.int64)
+        return lt, lt + self.size[:n]
+
+    def overlapping(self, rect):
+        if not self.n:
+            return self._empty[:, 0]
+        lt, rb = self.bounds()
+        hit = (lt < (rect.right, rect.bottom)) & (rb > (rect.left, rect.top))
+        return np.flatnonzero(hit.all(axis=1))
+
+    def rect(self, i) -> pygame.Rect:
+        (x, y), (w, h) = self.pos[i].tolist(), self.size[i].tolist()
+        return pygame.Rect(int(x), int(y), w, h)
 
+    def rects(self) -> list[pygame.Rect]:
+        return [pygame.Rect(int(x), int(y), w, h)
+                for (x, y), (w, h) in zip(self.pos[:self.n].tolist(), self.size[:self.n].tolist())]
+
+    def source(self, i) -> str:
+        return SOURCES[self.src[i]]
+
+    def sprites(self, lag: float = 0.0, moved: int | None = None) -> list[tuple[pygame.Surface, list]]:
+        # lag: fracao do ultimo passo a desfazer (interpolacao); so as `moved`
+        # primeiras balas andaram nesse passo
+        n = self.n
+        if not n:
+            return []
+        pos = self.pos[:n]
+        if lag:
+            m = n if moved is None else min(moved, n)
+            pos = pos.copy()
+            pos[:m] -= self.vel[:m] * lag
+        imgs = [BULLET_IMGS[d] for d in DIRECTIONS]
+        four = len(DIRECTIONS)
+        return list(zip([imgs[d] if d < four else rotated("BULLET_right", four - d)
+                         for d in self.dir[:n].tolist()], pos.tolist()))
+
+    def draw(self, surf):
+        surf.blits(self.sprites(), doreturn=False)
@@ -1,6 +1,6 @@
+import math
 import pygame
-from core.assets import CANNON_IMGS, DESTROYED_CANNON_IMGS
-from core.bullet import Bullet
+from core.assets import CANNON_IMGS, DESTROYED_CANNON_IMGS, CARDINALS, quantize, rotated, step_angle
 
 DIRECTION_VECTORS = {
     "up":    ( 0, -1),
@@ -8,25 +8,47 @@ DIRECTION_VECTORS = {
     "left":  (-1,  0),
     "right": ( 1,  0)
 }
+HEADINGS = {d: step for step, d in CARDINALS.items()}
+
+def heading(direction) -> int:
+    # passo do angulo (assets.ANGLE_STEPS) de um nome de direcao ou de graus
+    if isinstance(direction, str):
+        return HEADINGS[direction]
+    return quantize(direction)
 
 class Cannon:
     def __init__(self, x, y, direction="up"):
         self.x, self.y = x, y
         self.direction = direction
-        self.image = CANNON_IMGS[direction]
+        self.heading = heading(direction)
+        # as quatro direcoes usam os sprites prontos e vetores inteiros; o resto
+        # gira o sprite base (virado pra baixo) pelo cache de transformacoes
+        self.orientation = CARDINALS.get(self.heading)
+        if self.orientation:
+            self.vector = DIRECTION_VECTORS[self.orientation]
+        else:
+            angle = math.radians(step_angle(self.heading))
+            self.vector = (math.cos(angle), math.sin(angle))
+        self.image = self._sprite(CANNON_IMGS, "CANNON_down")
         self.rect = self.image.get_rect(topleft=(x, y))
         self.active = True
 
+    def _sprite(self, imgs, base):
+        if self.orientation:
+            return imgs[self.orientation]
+        return rotated(base, HEADINGS["down"] - self.heading)
+
     def draw(self, surf):
         surf.blit(self.image, self.rect)
 
-    def fire(self):
+    def fire_into(self, store):
+        # ocupa uma vaga do BulletStore (sem objeto por bala)
         if not self.active:
             return None
-        dx, dy = DIRECTION_VECTORS[self.direction]
-        return Bullet(self.rect.centerx, self.rect.centery, dx, dy, source ="cannon")
+        dx, dy = self.vector
+        return store.spawn(self.rect.centerx, self.rect.centery, dx, dy, source="cannon")
     
     def hit(self):
         if self.active:
             self.active = False
-            self.image = DESTROYED_CANNON_IMGS[self.direction]
+            self.image = self._sprite(DESTROYED_CANNON_IMGS, "DESTROYED_CANNON_down")
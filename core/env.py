@@ -0,0 +1,234 @@
+import argparse, multiprocessing as mp, os, pathlib, sys, time
+from multiprocessing.shared_memory import SharedMemory
+
+import numpy as np
+
+from core.level import DATA, open_levels
+from core.score import ScoreManager
+from core.sim import Simulation, LEFT, RIGHT, FIRE
+
+# ambiente no estilo Gym sobre a Simulation (o nucleo sem desenho do PlayState),
+# uma fase por episodio. Acoes: bitmask de LEFT/RIGHT/FIRE, 0..7
+N_ACTIONS = 8
+MAX_FRAMES = 3000     # episodio truncado depois disso (100 s de jogo)
+
+# observacao: vetor float32 de tamanho fixo, posicoes em pixels (canto superior
+# esquerdo). Entidades alem do limite ficam de fora; vagas sobrando sao zero
+MAX_TARGETS = 16
+MAX_CANNONS = 8
+MAX_POWERUPS = 8
+MAX_BULLETS = 32
+LAYOUT = (("ship", 1, 4),            # x, y, hp, municao
+          ("targets", MAX_TARGETS, 3),     # x, y, vivo
+          ("cannons", MAX_CANNONS, 3),     # x, y, ativo
+          ("powerups", MAX_POWERUPS, 4),   # x, y, presente, 1 se hp / 0 se ammo
+          ("bullets", MAX_BULLETS, 4),     # x, y, vx, vy
+          ("enemy_bullets", MAX_BULLETS, 4))
+OFFSETS = {}
+_pos = 0
+for _name, _n, _w in LAYOUT:
+    OFFSETS[_name] = (_pos, _n, _w)
+    _pos += _n * _w
+OBS_SIZE = _pos
+
+
+def _table(out, name):
+    off, n, w = OFFSETS[name]
+    return out[off:off + n * w].reshape(n, w)
+
+
+class PlayEnv:
+    # recompensa por passo: variacao de ScoreManager.score_of(hp, municao), ou
+    # seja -10 por tiro, +10/+100 por power-up, -100 por vida perdida; ao vencer
+    # a fase soma o que ela rende no score (vidas e municao que sobrou)
+    def __init__(self, levels: pathlib.Path = DATA, max_frames: int = MAX_FRAMES, bullet_speed: int = 16):
+        self.levels = open_levels(levels)
+        self.max_frames = max_frames
+        self.bullet_speed = bullet_speed
+        self.sim: Simulation | None = None
+        self.level = 0
+        self._value = 0
+
+    def reset(self, level: int = 0, hp: int = 3) -> np.ndarray:
+        self.level = level
+        self.sim = Simulation(self.levels.get_level(level), hp, self.bullet_speed)
+        self._value = ScoreManager.score_of(self.sim.hp, self.sim.lvl.ammo)
+        return self.observe()
+
+    def step(self, action: int) -> tuple[np.ndarray, float, bool, dict]:
+        sim = self.sim
+        outcomes = sim.step(int(action) & (LEFT | RIGHT | FIRE))
+        value = ScoreManager.score_of(sim.hp, sim.lvl.ammo)
+        reward, self._value = value - self._value, value
+        kind = outcomes[-1][0] if outcomes else None
+        if kind == "advance":
+            reward += value
+        done = kind is not None or sim.frame >= self.max_frames
+        info = {"outcome": kind, "frame": sim.frame, "hp": sim.hp, "ammo": sim.lvl.ammo,
+                "truncated": kind is None and done}
+        return self.observe(), float(reward), done, info
+
+    def observe(self, out: np.ndarray | None = None) -> np.ndarray:
+        if out is None:
+            out = np.zeros(OBS_SIZE, np.float32)
+        else:
+            out[:] = 0
+        sim = self.sim
+        out[:4] = (*sim.ship.rect.topleft, sim.hp, sim.lvl.ammo)
+
+        rows = [(*t.rect.topleft, not t.dead) for t in sim.lvl.targets[:MAX_TARGETS]]
+        if rows:
+            _table(out, "targets")[:len(rows)] = rows
+        rows = [(*c.rect.topleft, c.active) for c in sim.lvl.cannons[:MAX_CANNONS]]
+        if rows:
+            _table(out, "cannons")[:len(rows)] = rows
+        rows = [(*p.rect.topleft, not p.collected, p.kind == "hp") for p in sim.powerups[:MAX_POWERUPS]]
+        if rows:
+            _table(out, "powerups")[:len(rows)] = rows
+        for name, store in (("bullets", sim.bullets), ("enemy_bullets", sim.enemy_bullets)):
+            k = min(store.n, MAX_BULLETS)
+            table = _table(out, name)
+            table[:k, :2] = store.pos[:k]
+            table[:k, 2:] = store.vel[:k]
+        return out
+
+
+# ---- varias instancias em processos, no mesmo passo ----
+
+def _buffers(buf, n):
+    # blocos da memoria compartilhada: observacoes, recompensas, fim e acoes
+    obs = np.ndarray((n, OBS_SIZE), np.float32, buf, 0)
+    off = obs.nbytes
+    reward = np.ndarray(n, np.float32, buf, off)
+    done = np.ndarray(n, np.bool_, buf, off + reward.nbytes)
+    action = np.ndarray(n, np.uint8, buf, off + reward.nbytes + done.nbytes)
+    return obs, reward, done, action
+
+def _shm_size(n):
+    return n * (OBS_SIZE * 4 + 4 + 1 + 1)
+
+def _worker(conn, shm_name, n, lo, hi, kwargs):
+    shm = SharedMemory(shm_name)
+    obs, reward, done, action = _buffers(shm.buf, n)
+    envs = [PlayEnv(**kwargs) for _ in range(lo, hi)]
+    try:
+        while True:
+            cmd, arg = conn.recv()
+            if cmd == "reset":
+                for i, env in enumerate(envs, lo):
+                    env.reset(arg[i])
+                    env.observe(obs[i])
+                conn.send(None)
+            elif cmd == "step":
+                infos = []
+                for i, env in enumerate(envs, lo):
+                    _, r, d, info = env.step(action[i])
+                    if d:
+                        # recomeca sozinho; a observacao devolvida ja e do episodio novo
+                        env.reset(env.level)
+                    env.observe(obs[i])
+                    reward[i], done[i] = r, d
+                    infos.append(info)
+                conn.send(infos)
+            else:
+                break
+    finally:
+        del obs, reward, done, action
+        shm.close()
+        conn.close()
+
+
+class VecPlayEnv:
+    # n PlayEnv divididos entre processos, avancando juntos. Observacoes,
+    # recompensas e acoes ficam num bloco de memoria compartilhada; pelos
+    # pipes so passam os comandos e os dicts de info
+    def __init__(self, n: int, workers: int | None = None, **kwargs):
+        self.n = n
+        workers = max(1, min(n, workers or os.cpu_count() or 1))
+        self._shm = SharedMemory(create=True, size=_shm_size(n))
+        self.obs, self.rewards, self.dones, self.actions = _buffers(self._shm.buf, n)
+        bounds = [n * w // workers for w in range(workers + 1)]
+        self._conns, self._procs = [], []
+        for lo, hi in zip(bounds, bounds[1:]):
+            parent, child = mp.Pipe()
+            proc = mp.Process(target=_worker, args=(child, self._shm.name, n, lo, hi, kwargs), daemon=True)
+            proc.start()
+            child.close()
+            self._conns.append(parent)
+            self._procs.append(proc)
+
+    def __enter__(self): return self
+
+    def __exit__(self, *exc): self.close()
+
+    def reset(self, levels=0) -> np.ndarray:
+        levels = [levels] * self.n if isinstance(levels, int) else list(levels)
+        for conn in self._conns:
+            conn.send(("reset", levels))
+        for conn in self._conns:
+            conn.recv()
+        return self.obs
+
+    def step(self, actions) -> tuple[np.ndarray, np.ndarray, np.ndarray, list[dict]]:
+        # os arrays devolvidos sao a propria memoria compartilhada: copie se for guardar
+        self.actions[:] = actions
+        for conn in self._conns:
+            conn.send(("step", None))
+        infos = []
+        for conn in self._conns:
+            infos += conn.recv()
+        return self.obs, self.rewards, self.dones, infos
+
+    def close(self):
+        if self._shm is None:
+            return
+        for conn in self._conns:
+            try:
+                conn.send(("close", None))
+            except OSError:
+                pass
+        for proc in self._procs:
+            proc.join(timeout=5)
+        del self.obs, self.rewards, self.dones, self.actions
+        try:
+            self._shm.close()
+        except BufferError:
+            pass        # quem chamou ainda segura uma view; o unlink libera no fim
+        self._shm.unlink()
+        self._shm = None
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="mede passos/s do ambiente com agentes aleatorios")
+    parser.add_argument("-n", "--envs", type=int, default=8)
+    parser.add_argument("-j", "--workers", type=int, default=None)
+    parser.add_argument("-s", "--steps", type=int, default=2000)
+    parser.add_argument("--levels", type=pathlib.Path, default=DATA)
+    args = parser.parse_args(argv)
+
+    rng = np.random.default_rng(0)
+    n_levels = open_levels(args.levels).count
+    levels = [i % n_levels for i in range(args.envs)]
+
+    env = PlayEnv(args.levels)
+    start = time.perf_counter()
+    env.reset(levels[0])
+    for _ in range(args.steps):
+        if env.step(int(rng.integers(N_ACTIONS)))[2]:
+            env.reset(levels[0])
+    single = args.steps / (time.perf_counter() - start)
+
+    with VecPlayEnv(args.envs, args.workers, levels=args.levels) as vec:
+        vec.reset(levels)
+        start = time.perf_counter()
+        episodes = 0
+        for _ in range(args.steps):
+            _, _, dones, _ = vec.step(rng.integers(N_ACTIONS, size=args.envs))
+            episodes += int(dones.sum())
+        batched = args.steps * args.envs / (time.perf_counter() - start)
+    print(f"1 ambiente: {single:.0f} passos/s | {args.envs} ambientes em "
+          f"{len(vec._procs)} processos: {batched:.0f} passos/s ({episodes} episodios)")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
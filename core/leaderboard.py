@@ -0,0 +1,114 @@
+import bisect
+
+# entrada: (id, nome, pontuacao, ts). Empates ficam em ordem de id (mais antiga primeiro)
+
+
+class Fenwick:
+    # somas de prefixo e busca por posicao em O(log n)
+    def __init__(self, counts=()):
+        tree = [0, *counts]
+        for i in range(1, len(tree)):
+            j = i + (i & -i)
+            if j < len(tree):
+                tree[j] += tree[i]
+        self.tree = tree
+
+    def __len__(self): return len(self.tree) - 1
+
+    def add(self, i: int, delta: int):
+        i += 1
+        while i < len(self.tree):
+            self.tree[i] += delta
+            i += i & -i
+
+    def prefix(self, i: int) -> int:
+        # soma das posicoes [0, i)
+        total = 0
+        while i > 0:
+            total += self.tree[i]
+            i -= i & -i
+        return total
+
+    def find(self, k: int) -> int:
+        # menor i com prefix(i + 1) > k
+        pos, step = 0, 1 << len(self).bit_length()
+        while step:
+            nxt = pos + step
+            if nxt < len(self.tree) and self.tree[nxt] <= k:
+                pos = nxt
+                k -= self.tree[nxt]
+            step >>= 1
+        return pos
+
+
+class Ranking:
+    # todas as pontuacoes a partir de `since`, agrupadas por valor. A arvore
+    # conta quantas entradas cada valor distinto tem, do maior pro menor
+    def __init__(self, since: float = 0.0):
+        self.since = since
+        self._keys: list[int] = []           # valores distintos negados, crescente
+        self.buckets: dict[int, list[tuple]] = {}
+        self.tree = Fenwick()
+        self.best: dict[str, tuple] = {}
+        self.total = 0
+
+    def __len__(self): return self.total
+
+    def add(self, entry: tuple):
+        _, name, score, ts = entry
+        if ts < self.since:
+            return
+        bucket = self.buckets.get(score)
+        if bucket is None:
+            # valor novo: reconstroi a arvore (so acontece por valor distinto)
+            bisect.insort(self._keys, -score)
+            bucket = self.buckets[score] = []
+            self.tree = Fenwick([len(self.buckets.get(-k, ())) for k in self._keys])
+        bucket.append(entry)
+        self.tree.add(bisect.bisect_left(self._keys, -score), 1)
+        self.total += 1
+        best = self.best.get(name)
+        if best is None or score > best[2]:
+            self.best[name] = entry
+
+    def extend(self, entries):
+        # carga em lote (entradas em ordem de id): agrupa tudo e monta a arvore uma vez
+        for entry in entries:
+            _, name, score, ts = entry
+            if ts < self.since:
+                continue
+            self.buckets.setdefault(score, []).append(entry)
+            self.total += 1
+            best = self.best.get(name)
+            if best is None or score > best[2]:
+                self.best[name] = entry
+        self._keys = sorted(-k for k in self.buckets)
+        self.tree = Fenwick([len(self.buckets[-k]) for k in self._keys])
+
+    def above(self, score: int) -> int:
+        return self.tree.prefix(bisect.bisect_left(self._keys, -score))
+
+    def rank(self, score: int) -> int:
+        # posicao que uma pontuacao nova teria (depois dos empates)
+        return self.tree.prefix(bisect.bisect_right(self._keys, -score)) + 1
+
+    def rank_of(self, entry: tuple) -> int:
+        bucket = self.buckets[entry[2]]
+        return self.above(entry[2]) + bisect.bisect_left(bucket, entry[0], key=lambda e: e[0]) + 1
+
+    def page(self, start: int, stop: int) -> list[tuple[int, tuple]]:
+        # posicoes start..stop (inclusive, a partir de 1)
+        out = []
+        r, stop = max(start, 1), min(stop, self.total)
+        while r <= stop:
+            i = self.tree.find(r - 1)
+            bucket = self.buckets[-self._keys[i]]
+            offset = r - 1 - self.tree.prefix(i)
+            for e in bucket[offset:offset + stop - r + 1]:
+                out.append((r, e))
+                r += 1
+        return out
+
+    def player_best(self, name: str) -> tuple[int, tuple] | None:
+        entry = self.best.get(name)
+        return None if entry is None else (self.rank_of(entry), entry)
@@ -1,9 +1,13 @@
-import json, pathlib
+import json, pathlib, hashlib
+from concurrent.futures import Future, ThreadPoolExecutor
+from functools import cached_property
+from types import MappingProxyType
 
 from dataclasses import dataclass
 from core.target import Target
 from core.powerup import PowerUp
-from core.cannon import Cannon
+from core.cannon import Cannon, DIRECTION_VECTORS
+from core.assets import CANNON_IMGS, DESTROYED_CANNON_IMGS, REGISTRY
 
 DATA = pathlib.Path(__file__).parents[1] / "levels"
 
@@ -15,22 +19,97 @@ class Level:
     ammo: int
     cannons: list
 
-def load_level(name, idx):
-    cfg = json.loads((DATA/name).read_text())
-    targets = [Target(t["x"], t["y"], t.get("movement")) for t in cfg["targets"]]
-    cannons = [Cannon(c["x"], c["y"], c.get("direction", "up")) for c in cfg.get("cannons", [])]
+@dataclass(frozen=True)
+class LevelTemplate:
+    # fase ja lida e validada; cada partida recebe entidades novas
+    ammo: int
+    targets: tuple
+    cannons: tuple
+    powerups: tuple
+
+    def instantiate(self, idx: int) -> Level:
+        return Level(idx=idx,
+                     targets=[Target(x, y, m) for x, y, m in self.targets],
+                     cannons=[Cannon(x, y, d) for x, y, d in self.cannons],
+                     powerups=[PowerUp(k, x, y, v, m) for k, x, y, v, m in self.powerups],
+                     ammo=self.ammo)
+
+    def digest(self) -> bytes:
+        # identifica o conteudo da fase (replays e solver detectam mudancas).
+        # Fica guardado fora dos campos: o template e imutavel
+        cached = self.__dict__.get("_digest")
+        if cached is None:
+            cached = hashlib.sha1(repr(self).encode()).digest()[:8]
+            object.__setattr__(self, "_digest", cached)
+        return cached
+
+def _number(value, what):
+    if isinstance(value, bool) or not isinstance(value, (int, float)):
+        raise ValueError(f"{what} must be a number, got {value!r}")
+    return value
+
+def _point(value, what):
+    if not isinstance(value, (list, tuple)) or len(value) != 2:
+        raise ValueError(f"{what} must be an [x, y] pair, got {value!r}")
+    return (_number(value[0], what), _number(value[1], what))
 
-    powerups_cfg = cfg.get("powerups", [])
-    powerups = [
-        PowerUp(p["type"], p["x"], p["y"], p.get("value", 1), p.get("movement"))
-        for p in powerups_cfg
-    ]
+def _movement(cfg, what):
+    if not cfg:
+        return None
+    move = {"speed": _number(cfg.get("speed", 0.01), f"{what}.speed")}
+    if move["speed"] <= 0:
+        raise ValueError(f"{what}.speed must be positive")
+    for key in ("start", "end"):
+        if key in cfg:
+            move[key] = _point(cfg[key], f"{what}.{key}")
+    return MappingProxyType(move)
 
-    return Level(idx=idx, cannons = cannons, targets=targets, powerups=powerups, ammo=cfg.get("ammo", 0))
+def compile_level(cfg: dict, name: str = "level") -> LevelTemplate:
+    try:
+        targets = tuple(
+            (_number(t["x"], f"targets[{i}].x"), _number(t["y"], f"targets[{i}].y"),
+             _movement(t.get("movement"), f"targets[{i}].movement"))
+            for i, t in enumerate(cfg["targets"]))
+        cannons = []
+        for i, c in enumerate(cfg.get("cannons", [])):
+            # nome de direcao ou angulo em graus (0 direita, 90 baixo)
+            direction = c.get("direction", "up")
+            if isinstance(direction, str):
+                if direction not in DIRECTION_VECTORS:
+                    raise ValueError(f"cannons[{i}].direction: unknown direction {direction!r}")
+            else:
+                direction = _number(direction, f"cannons[{i}].direction")
+            cannons.append((_number(c["x"], f"cannons[{i}].x"), _number(c["y"], f"cannons[{i}].y"), direction))
+        powerups = []
+        for i, p in enumerate(cfg.get("powerups", [])):
+            if p["type"] not in PowerUp.TYPE_SPRITES:
+                raise ValueError(f"powerups[{i}].type: unknown power-up kind {p['type']!r}")
+            powerups.append((p["type"], _number(p["x"], f"powerups[{i}].x"), _number(p["y"], f"powerups[{i}].y"),
+                             _number(p.get("value", 1), f"powerups[{i}].value"),
+                             _movement(p.get("movement"), f"powerups[{i}].movement")))
+        ammo = cfg.get("ammo", 0)
+        if isinstance(ammo, bool) or not isinstance(ammo, int) or ammo < 0:
+            raise ValueError(f"ammo must be a non-negative integer, got {ammo!r}")
+    except KeyError as e:
+        raise ValueError(f"{name}: missing field {e}") from None
+    except ValueError as e:
+        raise ValueError(f"{name}: {e}") from None
+    return LevelTemplate(ammo=ammo, targets=targets, cannons=tuple(cannons), powerups=tuple(powerups))
+
+def load_template(path: pathlib.Path) -> LevelTemplate:
+    return compile_level(json.loads(path.read_text()), path.name)
+
+def load_level(name, idx, dir_path: pathlib.Path = DATA):
+    return load_template(dir_path/name).instantiate(idx)
 
 class LevelManager:
     def __init__(self, dir_path: pathlib.Path = DATA):
-        self.files = sorted(p for p in dir_path.iterdir() if p.suffix == ".json")
+        self.dir_path = dir_path
+        self._templates: dict[pathlib.Path, tuple[int, LevelTemplate]] = {}
+
+    @cached_property
+    def files(self):
+        return sorted(p for p in self.dir_path.iterdir() if p.suffix == ".json")
 
     def __len__(self): return len(self.files)
     @property
@@ -39,4 +118,76 @@ class LevelManager:
     def get_level(self, idx: int) -> Level:
         if not (0 <= idx < len(self.files)):
             raise IndexError("level index out of range")
-        return load_level(self.files[idx].name, idx)
+        return self.template(idx).instantiate(idx)
+
+    def template(self, idx: int) -> LevelTemplate:
+        # recompila so quando o mtime do arquivo muda
+        path = self.files[idx]
+        mtime = path.stat().st_mtime_ns
+        cached = self._templates.get(path)
+        if cached is None or cached[0] != mtime:
+            cached = self._templates[path] = (mtime, load_template(path))
+        return cached[1]
+
+def open_levels(path: pathlib.Path = DATA):
+    # diretorio de JSONs ou pack compilado (python -m core.levelpack)
+    path = pathlib.Path(path)
+    if path.is_file():
+        from core.levelpack import LevelPack
+        return LevelPack(path)
+    return LevelManager(path)
+
+
+# sprites que Target/Cannon/PowerUp pegam ao nascer: decodificados no thread
+# principal antes da montagem ir pro prefetch, que fica so com dados
+ENTITY_SPRITES = ("ACTIVE_TARGET", "DESTROYED_TGT", *PowerUp.TYPE_SPRITES.names.values(),
+                  *CANNON_IMGS.names.values(), *DESTROYED_CANNON_IMGS.names.values())
+
+def _build(manager, idx: int) -> Level:
+    tpl = manager.template(idx)
+    tpl.digest()                # o PlayState pede o digest logo ao entrar
+    return tpl.instantiate(idx)
+
+class LevelPrefetch:
+    # monta a proxima fase numa thread enquanto uma tela de transicao espera
+    # o ENTER; o PlayState pega pronta em take(). So guarda uma por vez
+    def __init__(self):
+        self._pool: ThreadPoolExecutor | None = None
+        self._pending: tuple[object, int, Future] | None = None
+        self.hits = 0
+        self.misses = 0
+        self.cancelled = 0
+
+    def start(self, manager, idx: int):
+        if self._pending is not None and self._pending[:2] == (manager, idx):
+            return
+        self.cancel()
+        if not (0 <= idx < manager.count):
+            return
+        REGISTRY.preload(ENTITY_SPRITES)
+        if self._pool is None:
+            self._pool = ThreadPoolExecutor(1, thread_name_prefix="prefetch")
+        self._pending = (manager, idx, self._pool.submit(_build, manager, idx))
+
+    def cancel(self):
+        # se ja estiver rodando, termina sozinha e o resultado e descartado
+        if self._pending is not None:
+            self._pending[2].cancel()
+            self._pending = None
+            self.cancelled += 1
+
+    def take(self, manager, idx: int) -> Level:
+        pending = self._pending
+        if pending is not None and pending[0] is manager and pending[1] == idx:
+            self._pending = None
+            try:
+                level = pending[2].result()
+            except Exception:
+                pass                # carrega de novo abaixo e deixa o erro aparecer ali
+            else:
+                self.hits += 1
+                return level
+        else:
+            self.cancel()
+        self.misses += 1
+        return manager.get_level(idx)
@@ -0,0 +1,218 @@
+import argparse, mmap, pathlib, struct, sys, time
+from types import MappingProxyType
+
+import numpy as np
+
+from core.cannon import DIRECTION_VECTORS
+from core.level import DATA, Level, LevelTemplate, load_template
+from core.powerup import PowerUp
+
+MAGIC = b"LPK2"
+PACK_FILE = pathlib.Path("levels.pack")
+
+# formato: cabecalho, indice (um registro por fase) e tres tabelas de entidades
+# com registros de tamanho fixo; cada fase aponta pra um trecho de cada tabela.
+# Os numeros vao como float64 com um bit dizendo se eram int no JSON, pra fase
+# voltar identica (mesmo digest) a lida do JSON.
+HEADER = struct.Struct("<4sIIII")   # magic, fases, alvos, canhoes, power-ups
+
+INDEX = np.dtype([("name", "S32"), ("ammo", "<u4"),
+                  ("targets", "<u4"), ("n_targets", "<u4"),
+                  ("cannons", "<u4"), ("n_cannons", "<u4"),
+                  ("powerups", "<u4"), ("n_powerups", "<u4")])
+MOVER = [("x", "<f8"), ("y", "<f8"), ("sx", "<f8"), ("sy", "<f8"),
+         ("ex", "<f8"), ("ey", "<f8"), ("speed", "<f8"), ("flags", "<u2")]
+TARGET = np.dtype(MOVER)
+POWERUP = np.dtype(MOVER + [("value", "<f8"), ("kind", "u1")])
+CANNON = np.dtype([("x", "<f8"), ("y", "<f8"), ("angle", "<f8"), ("dir", "u1"), ("flags", "<u2")])
+
+HAS_MOVE, HAS_START, HAS_END = 1, 2, 4
+INT_BIT = {name: 8 << i for i, name in enumerate(("x", "y", "sx", "sy", "ex", "ey", "speed", "value", "angle"))}
+DIRECTIONS = tuple(DIRECTION_VECTORS)
+ANGLE = 255     # dir de canhao em angulo livre: vale o campo angle
+KINDS = tuple(PowerUp.TYPE_SPRITES.keys())
+
+
+def _align(n: int) -> int:
+    return (n + 7) & ~7
+
+def _layout(count, n_targets, n_cannons, n_powerups):
+    # offsets de cada tabela, alinhados em 8 bytes
+    offsets, pos = [], _align(HEADER.size)
+    for dtype, n in ((INDEX, count), (TARGET, n_targets), (CANNON, n_cannons), (POWERUP, n_powerups)):
+        offsets.append(pos)
+        pos = _align(pos + dtype.itemsize * n)
+    return offsets, pos
+
+
+# ---- escrita ----
+
+def _put(rec, name, value):
+    if float(value) != value:
+        raise ValueError(f"{name}: {value!r} does not fit a float64")
+    rec[name] = value
+    if isinstance(value, int):
+        rec["flags"] |= INT_BIT[name]
+
+def _put_mover(rec, x, y, move):
+    _put(rec, "x", x)
+    _put(rec, "y", y)
+    if move is None:
+        return
+    rec["flags"] |= HAS_MOVE
+    _put(rec, "speed", move["speed"])
+    if "start" in move:
+        rec["flags"] |= HAS_START
+        _put(rec, "sx", move["start"][0])
+        _put(rec, "sy", move["start"][1])
+    if "end" in move:
+        rec["flags"] |= HAS_END
+        _put(rec, "ex", move["end"][0])
+        _put(rec, "ey", move["end"][1])
+
+def build_pack(templates: list[tuple[str, LevelTemplate]]) -> bytes:
+    n_t = sum(len(t.targets) for _, t in templates)
+    n_c = sum(len(t.cannons) for _, t in templates)
+    n_p = sum(len(t.powerups) for _, t in templates)
+    offsets, size = _layout(len(templates), n_t, n_c, n_p)
+    index = np.zeros(len(templates), INDEX)
+    targets, cannons, powerups = np.zeros(n_t, TARGET), np.zeros(n_c, CANNON), np.zeros(n_p, POWERUP)
+
+    it = ic = ip = 0
+    for i, (name, tpl) in enumerate(templates):
+        if len(name.encode()) > 32:
+            raise ValueError(f"{name}: level name longer than 32 bytes")
+        index[i] = (name.encode(), tpl.ammo, it, len(tpl.targets), ic, len(tpl.cannons), ip, len(tpl.powerups))
+        for x, y, move in tpl.targets:
+            _put_mover(targets[it], x, y, move)
+            it += 1
+        for x, y, d in tpl.cannons:
+            rec = cannons[ic]
+            _put(rec, "x", x)
+            _put(rec, "y", y)
+            if isinstance(d, str):
+                rec["dir"] = DIRECTIONS.index(d)
+            else:
+                rec["dir"] = ANGLE
+                _put(rec, "angle", d)
+            ic += 1
+        for kind, x, y, value, move in tpl.powerups:
+            rec = powerups[ip]
+            _put_mover(rec, x, y, move)
+            _put(rec, "value", value)
+            rec["kind"] = KINDS.index(kind)
+            ip += 1
+
+    out = bytearray(size)
+    HEADER.pack_into(out, 0, MAGIC, len(templates), n_t, n_c, n_p)
+    for off, arr in zip(offsets, (index, targets, cannons, powerups)):
+        out[off:off + arr.nbytes] = arr.tobytes()
+    return bytes(out)
+
+def compile_pack(dir_path: pathlib.Path = DATA, out: pathlib.Path = PACK_FILE) -> int:
+    files = sorted(p for p in dir_path.iterdir() if p.suffix == ".json")
+    data = build_pack([(p.name, load_template(p)) for p in files])
+    tmp = out.with_name(out.name + ".tmp")
+    tmp.write_bytes(data)
+    tmp.replace(out)
+    return len(files)
+
+
+# ---- leitura ----
+
+# registros ja convertidos com tolist(): tuplas na ordem dos campos do dtype
+_X, _Y, _SX, _SY, _EX, _EY, _SPEED, _FLAGS, _VALUE, _KIND = range(10)
+
+def _num(row, i, name):
+    return int(row[i]) if row[_FLAGS] & INT_BIT[name] else row[i]
+
+def _movement(row):
+    flags = row[_FLAGS]
+    if not flags & HAS_MOVE:
+        return None
+    # mesma ordem de chaves do compile_level
+    move = {"speed": _num(row, _SPEED, "speed")}
+    if flags & HAS_START:
+        move["start"] = (_num(row, _SX, "sx"), _num(row, _SY, "sy"))
+    if flags & HAS_END:
+        move["end"] = (_num(row, _EX, "ex"), _num(row, _EY, "ey"))
+    return MappingProxyType(move)
+
+def _cannon(row):
+    x, y, angle, d, flags = row
+    if d == ANGLE:
+        d = int(angle) if flags & INT_BIT["angle"] else angle
+    else:
+        d = DIRECTIONS[d]
+    return (int(x) if flags & INT_BIT["x"] else x, int(y) if flags & INT_BIT["y"] else y, d)
+
+
+class LevelPack:
+    # mesma interface do LevelManager, lendo de um pack mapeado em memoria:
+    # abrir custa o cabecalho e cada fase decodifica so os proprios registros
+    def __init__(self, path: pathlib.Path = PACK_FILE):
+        self.path = pathlib.Path(path)
+        with open(self.path, "rb") as f:
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, count, n_t, n_c, n_p = HEADER.unpack_from(self._map, 0)
+        if magic != MAGIC:
+            raise ValueError(f"{self.path}: not a level pack")
+        offsets, size = _layout(count, n_t, n_c, n_p)
+        if len(self._map) < size:
+            raise ValueError(f"{self.path}: truncated level pack")
+        self.index, self.targets, self.cannons, self.powerups = (
+            np.frombuffer(self._map, dtype, n, off)
+            for dtype, n, off in zip((INDEX, TARGET, CANNON, POWERUP), (count, n_t, n_c, n_p), offsets))
+        self._templates: dict[int, LevelTemplate] = {}
+
+    def __len__(self): return len(self.index)
+    @property
+    def count(self):  return len(self.index)
+
+    @property
+    def names(self) -> list[str]:
+        return [n.decode() for n in self.index["name"]]
+
+    def get_level(self, idx: int) -> Level:
+        if not (0 <= idx < len(self.index)):
+            raise IndexError("level index out of range")
+        return self.template(idx).instantiate(idx)
+
+    def template(self, idx: int) -> LevelTemplate:
+        cached = self._templates.get(idx)
+        if cached is None:
+            cached = self._templates[idx] = self._decode(idx)
+        return cached
+
+    def _decode(self, idx: int) -> LevelTemplate:
+        (_, ammo, t0, nt, c0, nc, p0, np_) = self.index[idx].tolist()
+        return LevelTemplate(
+            ammo=ammo,
+            targets=tuple((_num(r, _X, "x"), _num(r, _Y, "y"), _movement(r))
+                          for r in self.targets[t0:t0 + nt].tolist()),
+            cannons=tuple(_cannon(r) for r in self.cannons[c0:c0 + nc].tolist()),
+            powerups=tuple((KINDS[r[_KIND]], _num(r, _X, "x"), _num(r, _Y, "y"),
+                            _num(r, _VALUE, "value"), _movement(r))
+                           for r in self.powerups[p0:p0 + np_].tolist()))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="compila levels/*.json num pack binario")
+    parser.add_argument("levels", nargs="?", type=pathlib.Path, default=DATA)
+    parser.add_argument("-o", "--out", type=pathlib.Path, default=PACK_FILE)
+    args = parser.parse_args(argv)
+
+    start = time.perf_counter()
+    try:
+        n = compile_pack(args.levels, args.out)
+    except ValueError as e:
+        print(f"erro: {e}")
+        return 1
+    pack = LevelPack(args.out)
+    print(f"{n} fases, {len(pack.targets)} alvos, {len(pack.cannons)} canhoes, "
+          f"{len(pack.powerups)} power-ups -> {args.out} "
+          f"({args.out.stat().st_size} bytes, {time.perf_counter() - start:.2f}s)")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,22 +1,23 @@
 import pygame
 from settings import WIDTH, HEIGHT
-from core.assets import SHIP_LEFT, SHIP_IDLE, SHIP_RIGHT
+from core import assets
 
 class Spaceship:
     def __init__(self):
-        self.image = SHIP_IDLE
+        self.image = assets.SHIP_IDLE
         self.rect = self.image.get_rect(midbottom=(WIDTH//2, HEIGHT-100))
         self.speed = 5
 
-    def update(self, keys):
+    def update(self, keys, frames=1):
+        # o clamp a cada passo da o mesmo que um clamp so no fim
         if keys[pygame.K_LEFT]:
-            self.rect.x -= self.speed
-            self.image = SHIP_LEFT
+            self.rect.x -= self.speed * frames
+            self.image = assets.SHIP_LEFT
         elif keys[pygame.K_RIGHT]:
-            self.rect.x += self.speed
-            self.image = SHIP_RIGHT
+            self.rect.x += self.speed * frames
+            self.image = assets.SHIP_RIGHT
         else:
-            self.image = SHIP_IDLE
+            self.image = assets.SHIP_IDLE
         self.rect.clamp_ip(pygame.Rect(0,0,WIDTH,HEIGHT))
 
     def draw(self, surf):
@@ -1,11 +1,10 @@
-import pygame
-from core.assets import POWERUPS
+from core.assets import SpriteGroup
 
 class PowerUp:
-    TYPE_SPRITES: dict[str, pygame.Surface] = {
-        "hp": POWERUPS["powerups2"],
-        "ammo": POWERUPS["powerups1"], 
-    }
+    TYPE_SPRITES: SpriteGroup = SpriteGroup({
+        "hp": "POWERUP_powerups2",
+        "ammo": "POWERUP_powerups1",
+    })
 
     def __init__(self, kind: str, x: int, y: int, value: int = 1, movement: dict | None = None):
         if kind not in self.TYPE_SPRITES:
@@ -24,16 +23,19 @@ class PowerUp:
             self.progress = 0.0
             self.direction = 1
 
-    def update(self):
+    def update(self, frames: int = 1):
         if self.collected or not self.movement:
             return
-        self.progress += self.direction * self.speed
-        if self.progress >= 1:
-            self.progress = 1
-            self.direction = -1
-        elif self.progress <= 0:
-            self.progress = 0
-            self.direction = 1
+        progress, direction = self.progress, self.direction
+        for _ in range(frames):
+            progress += direction * self.speed
+            if progress >= 1:
+                progress = 1
+                direction = -1
+            elif progress <= 0:
+                progress = 0
+                direction = 1
+        self.progress, self.direction = progress, direction
         x = self.lerp(self.start[0], self.end[0], self.progress)
         y = self.lerp(self.start[1], self.end[1], self.progress)
         self.rect.topleft = (int(x), int(y))
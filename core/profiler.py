@@ -0,0 +1,140 @@
+import csv, json, time
+from collections import deque
+
+import pygame
+
+from core.text import render_text
+
+WINDOW = 300          # frames usados nos percentis (10 s a 30 fps)
+MAX_EVENTS = 200_000  # eventos guardados pro trace
+OVERLAY_EVERY = 15    # frames entre atualizacoes do texto do overlay
+
+
+class _Phase:
+    __slots__ = ("prof", "name", "start")
+
+    def __init__(self, prof, name):
+        self.prof = prof
+        self.name = name
+
+    def __enter__(self):
+        prof = self.prof
+        prof._stack.append(self.name)
+        self.start = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, *exc):
+        end = time.perf_counter_ns()
+        prof = self.prof
+        name = "/".join(prof._stack)
+        prof._stack.pop()
+        prof._record(name, self.start, end - self.start)
+
+
+class _Null:
+    def __enter__(self): return self
+
+    def __exit__(self, *exc): pass
+
+_NULL = _Null()
+
+
+class Profiler:
+    # tempos por fase do loop (e sub-fases via lap) com percentis moveis
+    def __init__(self, window: int = WINDOW, max_events: int = MAX_EVENTS):
+        self.enabled = False
+        self.overlay = False
+        self.window = window
+        self.samples: dict[str, deque] = {}
+        self.events: deque = deque(maxlen=max_events)
+        self.frames: deque = deque(maxlen=max_events // 8)
+        self.frame = 0
+        self._stack: list[str] = []
+        self._current: dict[str, int] = {}
+        self._frame_start = time.perf_counter_ns()
+        self._origin = self._frame_start
+        self._lines: list[str] = []
+
+    def phase(self, name: str):
+        return _Phase(self, name) if self.enabled else _NULL
+
+    def mark(self) -> int:
+        return time.perf_counter_ns() if self.enabled else 0
+
+    def lap(self, name: str, since: int) -> int:
+        # sub-fase de since ate agora, dentro da fase aberta
+        if not self.enabled:
+            return 0
+        now = time.perf_counter_ns()
+        self._record("/".join((*self._stack, name)), since, now - since)
+        return now
+
+    def _record(self, name, start, dur):
+        self._current[name] = self._current.get(name, 0) + dur
+        self.events.append((name, start, dur))
+
+    def end_frame(self):
+        if not self.enabled:
+            return
+        now = time.perf_counter_ns()
+        self._current["frame"] = now - self._frame_start
+        self._frame_start = now
+        for name, dur in self._current.items():
+            if name not in self.samples:
+                self.samples[name] = deque(maxlen=self.window)
+            self.samples[name].append(dur)
+        self.frames.append((self.frame, self._current))
+        self._current = {}
+        self.frame += 1
+
+    def percentiles(self, name: str, qs=(50, 95, 99)) -> tuple[float, ...]:
+        data = sorted(self.samples.get(name, ()))
+        if not data:
+            return tuple(0.0 for _ in qs)
+        return tuple(data[min(len(data) - 1, len(data) * q // 100)] / 1e6 for q in qs)
+
+    def summary(self) -> list[str]:
+        lines = [f"{'fase':<28} {'p50':>6} {'p95':>6} {'p99':>6} ms"]
+        for name in sorted(self.samples, key=lambda n: (n != "frame", n)):
+            p50, p95, p99 = self.percentiles(name)
+            lines.append(f"{name:<28} {p50:6.2f} {p95:6.2f} {p99:6.2f}")
+        return lines
+
+    def draw_overlay(self, surf: pygame.Surface, font) -> pygame.Rect:
+        if not self._lines or self.frame % OVERLAY_EVERY == 0:
+            self._lines = self.summary()
+        imgs = [render_text(font, line, "green") for line in self._lines]
+        w = max(img.get_width() for img in imgs) + 8
+        h = sum(img.get_height() for img in imgs) + 8
+        box = pygame.Rect(0, 0, w, h)
+        surf.fill((0, 0, 0), box)
+        y = 4
+        for img in imgs:
+            surf.blit(img, (4, y))
+            y += img.get_height()
+        return box
+
+    def export(self, path: str):
+        if str(path).endswith(".csv"):
+            self.export_csv(path)
+        else:
+            self.export_trace(path)
+
+    def export_trace(self, path: str):
+        # formato Chrome trace / Perfetto: eventos completos ("X") em microssegundos
+        events = [{"name": name.rsplit("/", 1)[-1], "cat": name, "ph": "X", "pid": 0, "tid": 0,
+                   "ts": (start - self._origin) / 1000, "dur": dur / 1000}
+                  for name, start, dur in self.events]
+        with open(path, "w") as f:
+            json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, f)
+
+    def export_csv(self, path: str):
+        names = sorted({n for _, phases in self.frames for n in phases})
+        with open(path, "w", newline="") as f:
+            out = csv.writer(f)
+            out.writerow(["frame", *(f"{n}_ms" for n in names)])
+            for frame, phases in self.frames:
+                out.writerow([frame, *(f"{phases.get(n, 0) / 1e6:.4f}" for n in names)])
+
+
+PROFILER = Profiler()
@@ -0,0 +1,102 @@
+from collections import Counter
+
+import pygame
+
+from settings import WIDTH, HEIGHT
+
+# acima dessa fracao da tela suja, vale mais redesenhar tudo e dar flip
+FULL_REDRAW_RATIO = 0.4
+
+
+class DirtyRenderer:
+    def __init__(self, background: pygame.Surface, full_ratio: float = FULL_REDRAW_RATIO):
+        self.background = background
+        self.full_ratio = full_ratio
+        self._prev: list[tuple[pygame.Surface, pygame.Rect]] = []
+        self._damage: list[pygame.Rect] = []
+        self._full = True
+        # camada estatica: fundo + sprites parados, composta uma vez e refeita
+        # so onde algo nela muda (alvo destruido, canhao desativado...)
+        self.layer: pygame.Surface | None = None
+        self._static: list[tuple[pygame.Surface, pygame.Rect]] = []
+        self.rebuilds = 0
+
+    def invalidate(self):
+        self._full = True
+
+    def damage(self, rect: pygame.Rect):
+        # area pintada por fora (ex.: overlay) que precisa ser refeita no proximo frame
+        self._damage.append(pygame.Rect(rect))
+
+    @staticmethod
+    def _key(img, rect):
+        return id(img), rect.x, rect.y, rect.w, rect.h
+
+    @staticmethod
+    def _items(sprites):
+        return [(img, pos.copy() if isinstance(pos, pygame.Rect) else img.get_rect(topleft=pos))
+                for img, pos in sprites]
+
+    def _diff(self, prev, items) -> list[pygame.Rect]:
+        # rects que sumiram ou apareceram entre duas listas de sprites
+        old_keys = [self._key(img, r) for img, r in prev]
+        new_keys = [self._key(img, r) for img, r in items]
+        if old_keys == new_keys:
+            return []
+        before, after = Counter(old_keys), Counter(new_keys)
+        dirty = [r for k, (_, r) in zip(old_keys, prev) if before[k] > after[k]]
+        dirty += [r for k, (_, r) in zip(new_keys, items) if after[k] > before[k]]
+        return dirty
+
+    def _compose(self, static) -> list[pygame.Rect]:
+        # atualiza a camada estatica e devolve as areas dela que mudaram
+        items = self._items(static)
+        if self.layer is None:
+            self.layer = self.background.copy()
+            self.layer.blits(items, doreturn=False)
+            self._static = items
+            self.rebuilds += 1
+            self._full = True
+            return []
+        changed = self._diff(self._static, items)
+        self._static = items
+        if changed:
+            rects = [r for _, r in items]
+            for d in changed:
+                self.layer.set_clip(d)
+                self.layer.blit(self.background, d, d)
+                for i in d.collidelistall(rects):
+                    self.layer.blit(*items[i])
+            self.layer.set_clip(None)
+            self.rebuilds += 1
+        return changed
+
+    def render(self, surf: pygame.Surface, sprites, static=()) -> list[pygame.Rect] | None:
+        # sprites: (imagem, rect ou topleft) em ordem de desenho, por cima da
+        # camada estatica `static`. Devolve os rects a enviar com display.update,
+        # ou None quando redesenhou tudo.
+        changed = self._compose(static)
+        items = self._items(sprites)
+        prev, self._prev = self._prev, items
+
+        if not self._full:
+            dirty = self._diff(prev, items) + changed + self._damage
+            self._damage = []
+            screen = surf.get_rect()
+            dirty = [r.clip(screen) for r in dirty]
+            dirty = [r for r in dirty if r.w and r.h]
+            if sum(r.w * r.h for r in dirty) <= self.full_ratio * WIDTH * HEIGHT:
+                rects = [r for _, r in items]
+                for d in dirty:
+                    surf.set_clip(d)
+                    surf.blit(self.layer, d, d)
+                    for i in d.collidelistall(rects):
+                        surf.blit(*items[i])
+                surf.set_clip(None)
+                return dirty
+
+        self._full = False
+        self._damage = []
+        surf.blit(self.layer, (0, 0))
+        surf.blits(items, doreturn=False)
+        return None
@@ -0,0 +1,301 @@
+import argparse, pathlib, sys, threading, time
+from concurrent.futures import Future
+from dataclasses import dataclass, field
+
+import pygame
+
+from core.assets import REGISTRY
+from core.level import LevelManager, DATA, ENTITY_SPRITES, open_levels
+from core.score import ScoreManager
+from core.sim import Simulation, LEFT, RIGHT, FIRE, SKIP
+
+MAGIC = b"RPL1"
+REPLAY_DIR = pathlib.Path("replays")
+FPS_REAL = 30
+MAX_FRAMES = FPS_REAL * 60 * 60 * 4     # 4 horas de jogo; mais que isso e replay corrompido
+
+# formato: MAGIC, cabecalho em varints e uma lista de jogadas (uma por entrada
+# em PlayState). Cada jogada guarda o indice e o digest da fase e os frames em
+# RLE: byte = teclas (LEFT/RIGHT) | eventos << 2, bits dos eventos (0 = SPACE,
+# 1 = P) e quantas vezes o frame se repete.
+
+
+@dataclass
+class Play:
+    level: int
+    digest: bytes
+    frames: list[tuple[int, tuple[int, ...]]] = field(default_factory=list)
+
+
+@dataclass
+class Run:
+    not_used: int = 0
+    collected: tuple[int, ...] = ()
+    score: int | None = None
+    plays: list[Play] = field(default_factory=list)
+
+
+def _put(out: bytearray, n: int):
+    while True:
+        byte, n = n & 0x7F, n >> 7
+        out.append(byte | (0x80 if n else 0))
+        if not n:
+            return
+
+def _get(data, pos):
+    n = shift = 0
+    while True:
+        byte = data[pos]
+        pos += 1
+        n |= (byte & 0x7F) << shift
+        if byte < 0x80:
+            return n, pos
+        shift += 7
+
+def _frame(keys, events) -> bytes:
+    if len(events) > 63:
+        raise ValueError("too many events in one frame")
+    bits = sum(1 << i for i, a in enumerate(events) if a == SKIP)
+    return bytes([keys | len(events) << 2]) + bits.to_bytes((len(events) + 7) // 8, "little")
+
+def encode(run: Run) -> bytes:
+    out = bytearray(MAGIC)
+    _put(out, run.not_used)
+    _put(out, len(run.collected))
+    for idx in run.collected:
+        _put(out, idx)
+    _put(out, 0 if run.score is None else run.score + 1)
+    _put(out, len(run.plays))
+    for play in run.plays:
+        _put(out, play.level)
+        out += play.digest
+        runs = []
+        for f in play.frames:
+            if runs and runs[-1][0] == f:
+                runs[-1][1] += 1
+            else:
+                runs.append([f, 1])
+        _put(out, len(runs))
+        for (keys, events), count in runs:
+            out += _frame(keys, events)
+            _put(out, count)
+    return bytes(out)
+
+def decode(data: bytes) -> Run:
+    if data[:4] != MAGIC:
+        raise ValueError("not a replay")
+    try:
+        pos = 4
+        not_used, pos = _get(data, pos)
+        n, pos = _get(data, pos)
+        collected = []
+        for _ in range(n):
+            idx, pos = _get(data, pos)
+            collected.append(idx)
+        score, pos = _get(data, pos)
+        run = Run(not_used, tuple(collected), score - 1 if score else None)
+        n_plays, pos = _get(data, pos)
+        total = 0
+        for _ in range(n_plays):
+            level, pos = _get(data, pos)
+            play = Play(level, bytes(data[pos:pos + 8]))
+            pos += 8
+            n_runs, pos = _get(data, pos)
+            for _ in range(n_runs):
+                head = data[pos]
+                n_ev = head >> 2
+                size = (n_ev + 7) // 8
+                bits = int.from_bytes(data[pos + 1:pos + 1 + size], "little")
+                pos += 1 + size
+                events = tuple(SKIP if bits >> i & 1 else FIRE for i in range(n_ev))
+                count, pos = _get(data, pos)
+                # o RLE deixa um arquivo pequeno pedir bilhoes de frames
+                total += count
+                if total > MAX_FRAMES:
+                    raise ValueError("replay too long")
+                play.frames += [(head & 3, events)] * count
+            run.plays.append(play)
+    except IndexError:
+        raise ValueError("truncated replay") from None
+    return run
+
+
+class Recorder:
+    # grava a sessao a partir das chamadas do PlayState
+    def __init__(self):
+        self.enabled = True
+        self.run: Run | None = None
+        self._events: list[int] = []
+
+    def begin(self, level: int, digest: bytes, not_used: int, collected):
+        self._flush()
+        if not self.enabled:
+            return
+        if self.run is None:
+            self.run = Run(not_used, tuple(sorted(collected)))
+        self.run.plays.append(Play(level, digest))
+
+    def event(self, action: int):
+        if self.run is not None:
+            self._events.append(action)
+
+    def frame(self, keys: int):
+        if self.run is not None:
+            self.run.plays[-1].frames.append((keys, tuple(self._events)))
+            self._events = []
+
+    def _flush(self):
+        # eventos que encerraram a jogada antes do update do frame
+        if self._events and self.run is not None:
+            self.run.plays[-1].frames.append((0, tuple(self._events)))
+        self._events = []
+
+    def finish(self, score: int) -> bytes | None:
+        self._flush()
+        run, self.run = self.run, None
+        if run is None:
+            return None
+        run.score = score
+        return encode(run)
+
+
+RECORDER = Recorder()
+
+
+@dataclass
+class Result:
+    score: int | None
+    claimed: int | None
+    frames: int = 0
+    seconds: float = 0.0
+    error: str | None = None
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None and self.score is not None and self.score == self.claimed
+
+
+def replay(data: bytes | Run, manager: LevelManager | None = None, start_level: int = 0) -> Result:
+    # reexecuta a sessao sem desenhar, refazendo as transicoes do PlayState
+    started = time.perf_counter()
+    run = decode(data) if isinstance(data, (bytes, bytearray)) else data
+    manager = manager or LevelManager()
+    result = Result(None, run.score)
+    level, hp, not_used = start_level, 3, run.not_used
+    collected = set(run.collected)
+
+    for n, play in enumerate(run.plays):
+        last = n == len(run.plays) - 1
+        if play.level != level:
+            result.error = f"play {n}: expected level {level}, got {play.level}"
+            break
+        if level >= manager.count or manager.template(level).digest() != play.digest:
+            result.error = f"play {n}: level {level} changed since recording"
+            break
+
+        sim = Simulation(manager.get_level(level), hp, 16, collected)
+        outcomes = []
+        for keys, events in play.frames:
+            for a in events:
+                outcomes = sim.fire() if a == FIRE else sim.skip()
+                if outcomes:
+                    break
+            if not outcomes:
+                outcomes = sim.update({pygame.K_LEFT: bool(keys & LEFT), pygame.K_RIGHT: bool(keys & RIGHT)})
+            result.frames += 1
+            if outcomes:
+                break
+        if not outcomes:
+            if not last:
+                result.error = f"play {n}: ended without a result"
+            break
+
+        nxt = None
+        for kind, out_hp in outcomes:
+            if kind == "lose":
+                nxt = ("lose", out_hp)
+            elif kind == "global_lose":
+                nxt = ("global_lose", 3)
+            else:
+                not_used += sim.lvl.ammo
+                if level + 1 < manager.count:
+                    # WinState volta pro PLAY sem repassar o hp
+                    nxt = ("win", 3)
+                else:
+                    nxt = ("fin", ScoreManager.score_of(sim.hp, not_used))
+        kind, hp = nxt
+        if kind == "global_lose":
+            level = start_level
+        elif kind == "win":
+            level += 1
+        elif kind == "fin":
+            if not last:
+                result.error = f"play {n}: game finished but the recording goes on"
+            else:
+                result.score = hp
+            break
+
+    result.seconds = time.perf_counter() - started
+    return result
+
+def verify(data: bytes | None, score: int, manager: LevelManager | None = None, start_level: int = 0) -> bool:
+    if data is None:
+        return False
+    try:
+        result = replay(data, manager, start_level)
+    except ValueError:
+        return False
+    return result.ok and result.score == score
+
+def verify_async(data: bytes | None, score: int, manager: LevelManager | None = None,
+                 start_level: int = 0) -> Future:
+    # verify refaz a sessao inteira (segundos numa longa): numa thread, pra
+    # tela de fim nao travar. Os sprites das entidades saem do thread principal
+    REGISTRY.preload(ENTITY_SPRITES)
+    future = Future()
+
+    def work():
+        try:
+            future.set_result(verify(data, score, manager, start_level))
+        except BaseException as e:
+            future.set_exception(e)
+
+    threading.Thread(target=work, name="verify", daemon=True).start()
+    return future
+
+def archive(data: bytes, name: str, directory: pathlib.Path = REPLAY_DIR) -> pathlib.Path | None:
+    path = directory / f"{time.time_ns() // 1000}_{name or 'ANON'}.rpl"
+    try:
+        directory.mkdir(parents=True, exist_ok=True)
+        path.write_bytes(data)
+    except OSError:
+        return None
+    return path
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="reconfere replays gravados")
+    parser.add_argument("paths", nargs="*", type=pathlib.Path, default=[REPLAY_DIR])
+    parser.add_argument("--levels", type=pathlib.Path, default=DATA, help="diretorio ou pack de fases")
+    args = parser.parse_args(argv)
+
+    files = []
+    for p in args.paths:
+        files += sorted(p.glob("*.rpl")) if p.is_dir() else [p]
+    manager, failed, frames, secs = open_levels(args.levels), 0, 0, 0.0
+    for path in files:
+        try:
+            r = replay(path.read_bytes(), manager)
+        except ValueError as e:
+            r = Result(None, None, error=str(e))
+        frames += r.frames
+        secs += r.seconds
+        if not r.ok:
+            failed += 1
+            print(f"FALHOU {path.name}: score {r.score} (gravado {r.claimed}) {r.error or ''}")
+    speed = frames / FPS_REAL / secs if secs else 0
+    print(f"{len(files)} replays, {len(files) - failed} ok, {failed} falharam; "
+          f"{frames} frames em {secs:.2f}s ({speed:.0f}x tempo real)")
+    return 1 if failed else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,28 +1,282 @@
+import atexit
 import json
 import os
+import queue
+import sqlite3
+import threading
 import time
 
-SCORES_FILE = "scores.json"
+from core.leaderboard import Ranking
+
+SCORES_FILE = "scores.json"   # formato antigo, importado uma vez
+SCORES_DB   = "scores.db"
 MAX_SCORES  = 10
+RETRY_DELAY = 1.0             # segundos ate tentar de novo com o banco ocupado
+MAX_RETRIES = 10              # tentativas com o banco ocupado antes de desistir
+WINDOWS     = ("all", "week", "day")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS scores (
+    id    INTEGER PRIMARY KEY,
+    name  TEXT    NOT NULL,
+    score INTEGER NOT NULL,
+    ts    REAL    NOT NULL
+);
+CREATE INDEX IF NOT EXISTS scores_ts ON scores (ts);
+CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);
+"""
+
+def _connect(path):
+    # WAL: varios gabinetes leem e gravam no mesmo arquivo sem se bloquear,
+    # e uma queda no meio da escrita nao corrompe o que ja foi gravado
+    db = sqlite3.connect(path, timeout=10, isolation_level=None)
+    db.execute("PRAGMA journal_mode=WAL")
+    db.execute("PRAGMA synchronous=NORMAL")
+    db.executescript(SCHEMA)
+    return db
+
+def _busy(e: sqlite3.Error) -> bool:
+    # so trava passageira vale tentar de novo (disco, permissao e esquema nao)
+    code = getattr(e, "sqlite_errorcode", None)
+    if code is not None:
+        return code & 0xff in (sqlite3.SQLITE_BUSY, sqlite3.SQLITE_LOCKED)
+    return "locked" in str(e) or "busy" in str(e)
+
+def _row(name, score, ts):
+    return {"name": name, "score": score, "ts": ts}
+
+def window_start(window: str, now: float | None = None) -> float:
+    if window == "all":
+        return 0.0
+    t = time.localtime(now)
+    back = t.tm_wday if window == "week" else 0
+    return time.mktime((t.tm_year, t.tm_mon, t.tm_mday - back, 0, 0, 0, 0, 0, -1))
+
+
+class ScoreStore:
+    # rankings em memoria (geral, semana, hoje) servindo as telas, atualizados
+    # so com as linhas novas do banco. Montar a partir do historico (e refazer
+    # uma janela na virada do dia/semana) e as gravacoes ficam em threads
+    def __init__(self, path: str = SCORES_DB, legacy: str = SCORES_FILE, top: int = MAX_SCORES):
+        self.path = path
+        self.legacy = legacy
+        self.top = top
+        self._db: sqlite3.Connection | None = None
+        self._version = None
+        self._last_id = 0
+        # vazios ate a carga terminar: as telas mostram so os pendentes
+        self.boards: dict[str, Ranking] = {w: Ranking(window_start(w)) for w in WINDOWS}
+        self._ready = False
+        self._loader: threading.Thread | None = None
+        self._pending: list[dict] = []
+        self._lock = threading.Lock()
+        self._queue: queue.Queue = queue.Queue()
+        self._writer: threading.Thread | None = None
+
+    def _open(self):
+        if self._db is None:
+            self._db = _connect(self.path)
+        return self._db
+
+    def preload(self):
+        # chamado ao abrir o jogo, pra carga ja ter terminado na primeira tela de ranking
+        if self._loader is None:
+            self._start_load(WINDOWS)
+
+    def _start_load(self, windows):
+        self._loader = threading.Thread(target=self._load, args=(tuple(windows),),
+                                        name="scores-load", daemon=True)
+        self._loader.start()
+
+    def _load(self, windows):
+        try:
+            db = _connect(self.path)
+            if not self._ready:
+                self._migrate(db)
+            boards = {w: Ranking(window_start(w)) for w in windows}
+            # so as linhas da janela mais antiga pedida, pelo indice de ts
+            db.execute("BEGIN")
+            last = db.execute("SELECT COALESCE(MAX(id), 0) FROM scores").fetchone()[0]
+            rows = db.execute("SELECT id, name, score, ts FROM scores WHERE ts >= ? AND id <= ? ORDER BY id",
+                              (min(b.since for b in boards.values()), last)).fetchall()
+            db.execute("COMMIT")
+            for board in boards.values():
+                board.extend(rows)
+            with self._lock:
+                # linhas que o jogo leu enquanto isso (ao refazer uma janela)
+                for row in db.execute("SELECT id, name, score, ts FROM scores WHERE id > ? AND id <= ? "
+                                      "ORDER BY id", (last, self._last_id)):
+                    for board in boards.values():
+                        board.add(row)
+                # e as que o jogo ainda nao leu: o cursor vai pular pra last,
+                # entao os boards que nao foram refeitos recebem aqui
+                kept = [b for w, b in self.boards.items() if w not in boards]
+                for row in db.execute("SELECT id, name, score, ts FROM scores WHERE id > ? AND id <= ? "
+                                      "ORDER BY id", (self._last_id, last)):
+                    for board in kept:
+                        board.add(row)
+                    self._arrived(row)
+                self.boards.update(boards)
+                self._last_id = max(self._last_id, last)
+                self._version = None
+                self._ready = True
+            db.close()
+        except sqlite3.Error as e:
+            print(f"ranking nao carregado: {e}")
+            self._loader = None     # a proxima consulta tenta de novo
+
+    def _migrate(self, db):
+        if not os.path.exists(self.legacy):
+            return
+        # leitura simples primeiro: so pega a trava de escrita se ainda falta importar
+        if db.execute("SELECT 1 FROM meta WHERE key = 'migrated'").fetchone() is not None:
+            return
+        db.execute("BEGIN IMMEDIATE")
+        try:
+            if db.execute("SELECT 1 FROM meta WHERE key = 'migrated'").fetchone() is None:
+                with open(self.legacy, "r") as f:
+                    old = json.load(f)
+                db.executemany("INSERT INTO scores (name, score, ts) VALUES (?, ?, ?)",
+                               [(s["name"], s["score"], s.get("ts", 0.0)) for s in old])
+                db.execute("INSERT INTO meta VALUES ('migrated', ?)", (self.legacy,))
+            db.execute("COMMIT")
+        except (OSError, ValueError, KeyError, TypeError):
+            db.execute("ROLLBACK")
+
+    def _refresh(self):
+        # no thread do jogo so as linhas novas; carga inteira e viradas de
+        # dia/semana vao pro _load
+        if not self._ready:
+            self.preload()
+            return
+        stale = [w for w in WINDOWS if self.boards[w].since != window_start(w)]
+        if stale and (self._loader is None or not self._loader.is_alive()):
+            self._start_load(stale)
+        # data_version muda quando outra conexao (outro gabinete) grava
+        db = self._open()
+        with self._lock:
+            version = db.execute("PRAGMA data_version").fetchone()[0]
+            if version == self._version:
+                return
+            for row in db.execute("SELECT id, name, score, ts FROM scores WHERE id > ? ORDER BY id",
+                                  (self._last_id,)):
+                for board in self.boards.values():
+                    board.add(row)
+                self._last_id = row[0]
+                self._arrived(row)
+            self._version = version
+
+    def _arrived(self, row):
+        # a linha ja esta no ranking: sai dos pendentes (o writer grava fora
+        # da trava, entao a releitura pode chegar antes dele tirar)
+        p = _row(*row[1:])
+        if p in self._pending:
+            self._pending.remove(p)
+
+    def load(self, window: str = "all") -> list[dict]:
+        return self.page(1, self.top, window)
+
+    def page(self, start: int, stop: int, window: str = "all") -> list[dict]:
+        self._refresh()
+        with self._lock:
+            board = self.boards[window]
+            pending = [p for p in self._pending if p["ts"] >= board.since]
+            # pontuacoes ainda na fila de gravacao entram depois dos empates
+            rows = [dict(_row(*e[1:]), rank=r + sum(p["score"] > e[2] for p in pending))
+                    for r, e in board.page(start - len(pending), stop)]
+            for j, p in enumerate(pending):
+                ahead = sum(q["score"] >= p["score"] for q in pending[:j])
+                ahead += sum(q["score"] > p["score"] for q in pending[j + 1:])
+                rows.append(dict(p, rank=board.rank(p["score"]) + ahead))
+        rows = [r for r in rows if start <= r["rank"] <= stop]
+        return sorted(rows, key=lambda r: r["rank"])
+
+    def rank(self, score: int, window: str = "all") -> int:
+        self._refresh()
+        with self._lock:
+            board = self.boards[window]
+            ahead = sum(1 for s in self._pending if s["ts"] >= board.since and s["score"] >= score)
+            return board.rank(score) + ahead
+
+    def player_best(self, name: str, window: str = "all") -> dict | None:
+        self._refresh()
+        with self._lock:
+            found = self.boards[window].player_best(name)
+        if found is None:
+            return None
+        rank, e = found
+        return dict(_row(*e[1:]), rank=rank)
+
+    def save(self, name: str, score: int) -> list[dict]:
+        s = _row(name[:10], score, time.time())
+        with self._lock:
+            self._pending.append(s)
+        self._queue.put((s, 0))
+        if self._writer is None:
+            self._writer = threading.Thread(target=self._write_loop, name="scores", daemon=True)
+            self._writer.start()
+            atexit.register(self.flush)
+        return self.load()
+
+    def flush(self, timeout: float = 5.0):
+        # na saida espera a fila, mas nao pra sempre se o banco seguir travado
+        done = self._queue.all_tasks_done
+        with done:
+            done.wait_for(lambda: not self._queue.unfinished_tasks, timeout)
+
+    def _write_loop(self):
+        db = _connect(self.path)
+        while True:
+            s, tries = self._queue.get()
+            try:
+                # o INSERT pode esperar o busy timeout: fora da trava, pra
+                # nao segurar as consultas do jogo
+                db.execute("INSERT INTO scores (name, score, ts) VALUES (?, ?, ?)",
+                           (s["name"], s["score"], s["ts"]))
+            except sqlite3.Error as e:
+                if _busy(e) and tries < MAX_RETRIES:
+                    # banco ocupado (outro gabinete gravando): volta pra fila
+                    print(f"score adiado: {e}")
+                    time.sleep(RETRY_DELAY)
+                    self._queue.put((s, tries + 1))
+                    continue
+                print(f"score nao gravado: {e}")
+                self._forget(s)
+            else:
+                self._forget(s)
+            finally:
+                self._queue.task_done()
+
+    def _forget(self, s):
+        with self._lock:
+            if s in self._pending:
+                self._pending.remove(s)
+
+
+STORE = ScoreStore()
 
 def load_scores() -> list[dict]:
-    if os.path.exists(SCORES_FILE):
-        with open(SCORES_FILE, "r") as f:
-            return json.load(f)
-    return []
+    return STORE.load()
 
 def save_score(name: str, score: int) -> list[dict]:
-    scores = load_scores()
-    scores.append({"name": name[:10], "score": score, "ts": time.time()})
-    scores = sorted(scores, key=lambda s: -s["score"])[:MAX_SCORES]
-    with open(SCORES_FILE, "w") as f:
-        json.dump(scores, f)
-    return scores
+    return STORE.save(name, score)
+
+def score_rank(score: int, window: str = "all") -> int:
+    return STORE.rank(score, window)
+
+def ranked_scores(start: int, stop: int, window: str = "all") -> list[dict]:
+    return STORE.page(start, stop, window)
+
+def player_best(name: str, window: str = "all") -> dict | None:
+    return STORE.player_best(name, window)
 
 class ScoreManager:
     not_used_bullets = 0
 
+    @staticmethod
+    def score_of(remaining_hp, not_used_bullets):
+        return remaining_hp * 100 + not_used_bullets * 10
+
     @classmethod
     def get_score(cls, remaining_hp):
-        return remaining_hp * 100 + cls.not_used_bullets * 10
-
+        return cls.score_of(remaining_hp, cls.not_used_bullets)
@@ -0,0 +1,374 @@
+import copy, math
+from itertools import groupby
+from operator import itemgetter
+
+import numpy as np
+import pygame
+
+from core.bullet import BulletStore, DIRECTIONS, SOURCES
+from core.cannon import Cannon
+from core.level import Level
+from core.player import Spaceship
+from core.powerup import PowerUp
+from core.profiler import PROFILER
+from core.spatial import SpatialHash
+from core.sweep import sweep
+from core.target import Target
+
+# acoes de um frame, combinadas como bitmask
+LEFT  = 1
+RIGHT = 2
+FIRE  = 4
+SKIP  = 8
+
+# ate essa velocidade (px por passo) o teste na posicao final nao deixa bala
+# atravessar nada; acima dela a colisao passa a ser continua (core.sweep)
+DISCRETE_SPEED = 16
+
+
+class Simulation:
+    def __init__(self, lvl: Level, hp: int = 3, bullet_speed: int = 16,
+                 collected_hp_levels: set[int] | None = None, swept: bool | None = None):
+        self.lvl = lvl
+        self.hp = hp
+        self.bullet_speed = bullet_speed
+        self.swept = bullet_speed > DISCRETE_SPEED if swept is None else swept
+        self.collected_hp_levels = set() if collected_hp_levels is None else collected_hp_levels
+        self.ship = Spaceship()
+        self.bullets = BulletStore()
+        self.enemy_bullets = BulletStore()
+        self.powerups: list[PowerUp] = [
+            p for p in lvl.powerups
+            if not (p.kind == "hp" and lvl.idx in self.collected_hp_levels)
+        ]
+        self.frame = 0
+        self.outcome: tuple[str, int] | None = None
+        # estatisticas da tentativa (telemetria): tiros, power-ups pegos e o
+        # motivo do ultimo fim (clear, skip, bullet ou ammo)
+        self.shots = 0
+        self.taken = dict.fromkeys(PowerUp.TYPE_SPRITES, 0)
+        self.cause: str | None = None
+
+        # broadphase compartilhada por todas as passadas de colisao
+        self.grid = SpatialHash()
+        for t in lvl.targets: self.grid.update(t, t.rect)
+        for c in lvl.cannons:
+            if c.active: self.grid.update(c, c.rect)
+        for p in self.powerups:
+            if not p.collected: self.grid.update(p, p.rect)
+
+    def clone(self) -> "Simulation":
+        # copia independente do estado, pra explorar ramos a partir daqui
+        def dup(e):
+            e = copy.copy(e)
+            e.rect = e.rect.copy()
+            return e
+        new = copy.copy(self)
+        same = {id(e): dup(e) for e in (*self.lvl.targets, *self.lvl.cannons, *self.lvl.powerups)}
+        new.lvl = Level(idx=self.lvl.idx, ammo=self.lvl.ammo,
+                        targets=[same[id(t)] for t in self.lvl.targets],
+                        cannons=[same[id(c)] for c in self.lvl.cannons],
+                        powerups=[same[id(p)] for p in self.lvl.powerups])
+        new.powerups = [same[id(p)] for p in self.powerups]
+        new.ship = dup(self.ship)
+        new.bullets = self.bullets.copy()
+        new.enemy_bullets = self.enemy_bullets.copy()
+        new.collected_hp_levels = set(self.collected_hp_levels)
+        new.taken = dict(self.taken)
+        new.grid = SpatialHash(self.grid.cell_size)
+        for e in sorted(self.grid.order, key=self.grid.order.get):
+            new.grid.update(same[id(e)], same[id(e)].rect)
+        return new
+
+    @property
+    def done(self):
+        return self.outcome is not None
+
+    def _end(self, kind, out, cause):
+        self.outcome = (kind, self.hp)
+        self.cause = cause
+        out.append(self.outcome)
+
+    def fire(self):
+        out = []
+        if self.lvl.ammo:
+            self.bullets.spawn(self.ship.rect.centerx, self.ship.rect.top, speed=self.bullet_speed)
+            self.lvl.ammo -= 1
+            self.shots += 1
+            for cannon in self.lvl.cannons:
+                cannon.fire_into(self.enemy_bullets)
+        return out
+
+    def skip(self):
+        out = []
+        self.lvl.ammo = max(self.lvl.ammo - len(self.lvl.targets), 0)
+        self._end("advance", out, "skip")
+        return out
+
+    def step(self, actions: int = 0):
+        out = []
+        if actions & FIRE:
+            out += self.fire()
+        if actions & SKIP:
+            out += self.skip()
+        if out:
+            return out
+        keys = {pygame.K_LEFT: bool(actions & LEFT), pygame.K_RIGHT: bool(actions & RIGHT)}
+        return self.update(keys)
+
+    def advance(self, frames: int, actions: int = 0) -> tuple[int, list]:
+        # o mesmo que ate `frames` chamadas de step(actions), parando no primeiro
+        # resultado, mas pulando direto os trechos em que so ha movimento
+        if actions & ~(LEFT | RIGHT):
+            raise ValueError("advance only holds LEFT/RIGHT")
+        keys = {pygame.K_LEFT: bool(actions & LEFT), pygame.K_RIGHT: bool(actions & RIGHT)}
+        done = 0
+        while done < frames:
+            k = self.quiet(frames - done, actions)
+            if k:
+                self._coast(k, keys)
+                done += k
+            else:
+                done += 1
+                out = self.update(keys)
+                if out:
+                    return done, out
+        return done, []
+
+    def quiet(self, limit: int, actions: int = 0) -> int:
+        # quantos dos proximos passos (ate limit) com certeza nao tem evento:
+        # nenhuma bala sai da tela ou encosta em nada e a fase nao termina
+        if all(t.dead for t in self.lvl.targets):
+            return 0
+        pb, eb = self.bullets, self.enemy_bullets
+        if self.lvl.ammo == 0 and not pb.n:
+            return 0
+        if not eb.active[:eb.n].all():
+            return 0    # sobras do ultimo passo: o proximo compacta
+        if not pb.n and not eb.n:
+            return limit
+
+        def reach(e, moving):
+            # deslocamento maximo por passo em cada eixo (+1 do arredondamento do rect)
+            if not moving:
+                return 0, 0
+            return (math.ceil(abs(e.end[0] - e.start[0]) * e.speed) + 1,
+                    math.ceil(abs(e.end[1] - e.start[1]) * e.speed) + 1)
+
+        targets = [(t, reach(t, t.movement and not t.dead)) for t in self.lvl.targets]
+        cannons = [(c, (0, 0)) for c in self.lvl.cannons if c.active]
+        powerups = [(p, reach(p, p.movement)) for p in self.powerups if not p.collected]
+        ship = (self.ship, (self.ship.speed if actions else 0, 0))
+        cannon = SOURCES.index("cannon")
+        return min(limit,
+                   self._quiet_store(pb, [*targets, *cannons, *powerups], len(targets), len(cannons), cannon),
+                   self._quiet_store(eb, [ship, *targets, *cannons], 1 + len(targets), len(cannons), cannon))
+
+    @staticmethod
+    def _quiet_store(store, ents, first_cannon, n_cannons, cannon) -> int:
+        n = store.n
+        if not n:
+            return math.inf
+        lo, hi = store.bounds()
+        diagonal = store.diagonal()
+        if diagonal:
+            # posicao fracionaria: o rect inteiro pode andar ate um pixel a mais
+            # que ceil(|vel|) por eixo, entao desconta uma margem das distancias
+            vel = np.copysign(np.ceil(np.abs(store.vel[:n])), store.vel[:n]).astype(np.int64)
+            slack = np.where(store.dir[:n] >= len(DIRECTIONS), 2, 0)[:, None]
+        else:
+            vel = store.vel[:n].astype(np.int64)
+            slack = 0
+        # saida da tela: a bala some no passo em que passa do limite
+        with np.errstate(divide="ignore"):
+            out = np.where(vel < 0, ((hi - slack) // np.maximum(-vel, 1)) + 1,
+                           np.where(vel > 0, (store.LIMITS - lo - slack) // np.maximum(vel, 1) + 1, math.inf))
+        safe = out.min() - 1
+        if not ents:
+            return max(int(safe), 0)
+
+        rects = np.array([tuple(e.rect) for e, _ in ents], np.int64)
+        elo, ehi = rects[:, :2], rects[:, :2] + rects[:, 2:]
+        # folga entre as caixas e quanto ela pode fechar por passo, por eixo
+        gap = np.maximum(elo[None] - hi[:, None], lo[:, None] - ehi[None])
+        if diagonal:
+            gap -= slack[:, None]
+        closing = np.abs(vel)[:, None] + np.array([r for _, r in ents], np.int64)[None]
+        frames = np.where(gap < 0, -1, np.where(closing > 0, gap // np.maximum(closing, 1), math.inf))
+        frames = frames.max(axis=2)
+        # tiro de canhao atravessa canhao
+        frames[store.src[:n] == cannon, first_cannon:first_cannon + n_cannons] = math.inf
+        return max(int(min(safe, frames.min())), 0)
+
+    def _coast(self, k: int, keys):
+        # k passos sem evento: so movimento, com o mesmo resultado de k updates
+        self.frame += k
+        self.ship.update(keys, k)
+        grid = self.grid
+        for t in self.lvl.targets:
+            if t.movement and not t.dead:
+                t.update(k)
+                grid.update(t, t.rect)
+        for p in self.powerups:
+            if p.movement and not p.collected:
+                p.update(k)
+                grid.update(p, p.rect)
+        self.bullets.advance(k)
+        self.enemy_bullets.advance(k)
+
+    def update(self, keys):
+        out = []
+        prof = PROFILER
+        t0 = prof.mark()
+        self.frame += 1
+        if self.swept:
+            # posicoes no comeco do passo, pra varrer o caminho de cada um
+            ents = [self.ship, *self.lvl.targets, *self.lvl.cannons, *self.powerups]
+            start = np.array([e.rect.topleft for e in ents], np.int64)
+            before = (self.bullets.bounds()[0], self.enemy_bullets.bounds()[0])
+        self.ship.update(keys)
+
+        grid = self.grid
+        for t in self.lvl.targets:
+            if t.movement and not t.dead:
+                t.update()
+                grid.update(t, t.rect)
+
+        for p in self.powerups:
+            if p.movement and not p.collected:
+                p.update()
+                grid.update(p, p.rect)
+
+        pb = self.bullets
+        pb.advance()
+        t0 = prof.lap("entities", t0)
+        if self.swept:
+            return self._update_swept(ents, start, before, out, t0)
+        hits = grid.pairs(*pb.bounds())
+        for i, e in hits:
+            if type(e) is Target:
+                if not e.dead:
+                    e.hit()
+                pb.active[i] = False
+            elif type(e) is Cannon and e.active:
+                e.hit()
+                grid.remove(e)
+                pb.active[i] = False
+        t0 = prof.lap("hits_targets", t0)
+
+        # a bala so coleta power-ups se ainda estava ativa depois dos alvos
+        alive = pb.active.copy()
+        for i, e in hits:
+            if type(e) is PowerUp and alive[i] and not e.collected:
+                self.apply_power_up(e.kind, e.value)
+                e.collect()
+                grid.remove(e)
+                pb.active[i] = False
+        t0 = prof.lap("hits_powerups", t0)
+
+        pb.compact()
+        eb = self.enemy_bullets
+        eb.advance()
+        eb.compact()
+        t0 = prof.lap("compact", t0)
+
+        for i in eb.overlapping(self.ship.rect).tolist():
+            eb.active[i] = False
+            self.hp -= 1
+            self._end("lose" if self.hp else "global_lose", out, "bullet")
+        t0 = prof.lap("hits_ship", t0)
+
+        for i, e in grid.pairs(*eb.bounds()):
+            if type(e) is Target:
+                e.hit()
+                eb.active[i] = False
+            elif type(e) is Cannon and e.active and eb.source(i) != "cannon":
+                e.hit()
+                grid.remove(e)
+                eb.active[i] = False
+        prof.lap("hits_enemy", t0)
+        return self._check_end(out)
+
+    def _check_end(self, out):
+        if self.lvl.ammo == 0 and len(self.bullets) == 0:
+            self.hp -= 1
+            self._end("lose" if self.hp >= 0 else "global_lose", out, "ammo")
+
+        if all(t.dead for t in self.lvl.targets):
+            self._end("advance", out, "clear")
+
+        return out
+
+    def _update_swept(self, ents, start, before, out, t0):
+        # cada bala para no primeiro contato ao longo do passo, entao bala
+        # rapida nao atravessa alvo fino e alvo rapido nao pula a bala
+        prof = PROFILER
+        end = np.array([e.rect.topleft for e in ents], np.int64)
+        size = np.array([e.rect.size for e in ents], np.int64)
+        pb = self.bullets
+        self._resolve(pb, before[0], ents, start, end, size, enemy=False)
+        pb.compact()
+        t0 = prof.lap("sweep_player", t0)
+
+        eb = self.enemy_bullets
+        eb.advance()
+        self._resolve(eb, before[1], ents, start, end, size, enemy=True, out=out)
+        eb.compact()
+        prof.lap("sweep_enemy", t0)
+        return self._check_end(out)
+
+    def _resolve(self, store, before, ents, start, end, size, enemy, out=None):
+        lo, hi = store.bounds()
+        found = sweep(before, lo, hi - lo, start, end, size)
+        for i, group in groupby(found, key=itemgetter(0)):
+            cannon_shot = store.source(i) == "cannon"
+            for _, same in groupby(group, key=itemgetter(2)):
+                hit = [e for _, j, _ in same if self._blocks(e := ents[j], enemy, cannon_shot)]
+                if not hit:
+                    continue
+                # no mesmo instante alvo/canhao vale antes do power-up
+                solid = [e for e in hit if type(e) is not PowerUp]
+                for e in solid or hit:
+                    if type(e) is PowerUp:
+                        self.apply_power_up(e.kind, e.value)
+                        e.collect()
+                        self.grid.remove(e)
+                    elif type(e) is Spaceship:
+                        self.hp -= 1
+                        self._end("lose" if self.hp else "global_lose", out, "bullet")
+                    else:
+                        if type(e) is Cannon:
+                            self.grid.remove(e)
+                        e.hit()
+                store.active[i] = False
+                break
+
+    @staticmethod
+    def _blocks(e, enemy, cannon_shot):
+        kind = type(e)
+        if kind is Target:
+            return True            # alvo destruido tambem segura a bala
+        if kind is Cannon:
+            return e.active and not cannon_shot
+        if kind is PowerUp:
+            return not enemy and not e.collected
+        return enemy               # a nave so e atingida por tiro inimigo
+
+    def apply_power_up(self, kind: str, value: int):
+        self.taken[kind] += 1
+        match kind:
+            case "hp":
+                if self.lvl.idx not in self.collected_hp_levels:
+                    self.collected_hp_levels.add(self.lvl.idx)
+                self.hp = min(self.hp + value, 5)
+            case "ammo":
+                self.lvl.ammo += value
+
+
+def simulate(lvl: Level, actions, hp: int = 3, bullet_speed: int = 16,
+             collected_hp_levels: set[int] | None = None) -> Simulation:
+    sim = Simulation(lvl, hp, bullet_speed, collected_hp_levels)
+    for a in actions:
+        if sim.step(a):
+            break
+    return sim
@@ -0,0 +1,330 @@
+import argparse, json, os, pathlib, sys, time
+from collections import OrderedDict
+from dataclasses import replace
+from concurrent.futures import ProcessPoolExecutor
+from itertools import groupby
+
+import numpy as np
+
+from core.bullet import BULLET_IMGS, bullet_image
+from core.level import DATA, load_template
+from core.sim import Simulation, LEFT, RIGHT, FIRE
+from settings import WIDTH, HEIGHT
+
+# durante a busca a municao nunca acaba; quanto ela precisaria ser e medido a parte
+UNLIMITED = 1 << 20
+MIN_HORIZON = 96     # frames pra nave cruzar a tela
+MAX_HORIZON = 240
+SETTLE = 150         # frames maximos esperando as balas de um tiro sumirem
+DODGES = (0, LEFT, RIGHT)
+SNAPSHOTS = 256
+
+
+# ---- lado do worker: estados reconstruidos a partir do plano de acoes ----
+
+_templates = {}
+_snapshots: OrderedDict = OrderedDict()
+
+def _start(key, path):
+    # fases com o mesmo setup dividem template e snapshots (key vem de setup())
+    if key not in _templates:
+        _templates[key] = load_template(pathlib.Path(path))
+    sim = Simulation(_templates[key].instantiate(0))
+    sim.lvl.ammo = UNLIMITED
+    return sim
+
+def _remember(key, sim):
+    _snapshots[key] = sim
+    _snapshots.move_to_end(key)
+    while len(_snapshots) > SNAPSHOTS:
+        _snapshots.popitem(last=False)
+
+def _replay(key, path, plan: bytes) -> Simulation:
+    # parte do maior prefixo do plano que ja foi simulado neste processo
+    base, start = None, -1
+    for (k, done), sim in _snapshots.items():
+        if k == key and len(done) > start and plan.startswith(done):
+            base, start = sim, len(done)
+    if base is None:
+        sim, start = _start(key, path), 0
+    else:
+        sim = base.clone()
+    run(sim, plan[start:])
+    if start != len(plan):
+        _remember((key, plan), sim.clone())
+    return sim
+
+def run(sim: Simulation, plan: bytes):
+    # como sim.step em cada acao, mas trechos so de movimento pulam de evento em evento
+    for a, group in groupby(plan):
+        left = sum(1 for _ in group)
+        if a & ~(LEFT | RIGHT):
+            for _ in range(left):
+                sim.step(a)
+            continue
+        while left:
+            left -= sim.advance(left, a)[0]
+
+def signature(sim: Simulation):
+    # o que sobra da fase: alvos mortos ficam parados e ainda seguram balas
+    return (tuple(t.rect.topleft if t.dead else None for t in sim.lvl.targets),
+            tuple(c.active for c in sim.lvl.cannons),
+            tuple(p.collected for p in sim.powerups))
+
+def horizon(sim: Simulation) -> int:
+    movers = [e for e in (*sim.lvl.targets, *sim.powerups)
+              if e.movement and not getattr(e, "dead", False) and not getattr(e, "collected", False)]
+    period = max((int(2 / e.speed) + 2 for e in movers), default=0)
+    return min(max(MIN_HORIZON, period), MAX_HORIZON)
+
+def _flight(speed, pos, size, vel):
+    # quantos frames uma bala leva ate sair da tela
+    frames = 0
+    while (pos[0] + size[0] >= 0 and pos[1] + size[1] >= 0 and
+           pos[0] <= WIDTH and pos[1] <= HEIGHT):
+        pos = pos[0] + vel[0] * speed, pos[1] + vel[1] * speed
+        frames += 1
+    return frames
+
+def candidates(sim: Simulation, span: int):
+    # preve o que um tiro disparado em cada frame/posicao acerta primeiro e
+    # devolve um representante (espera, x) para cada resultado diferente
+    probe = sim.clone()
+    targets = probe.lvl.targets
+    cannons = [c for c in probe.lvl.cannons if c.active]
+    ents = [*targets, *cannons, *(p for p in probe.powerups if not p.collected)]
+    if not ents:
+        return []
+
+    ship, step = sim.ship.rect, sim.ship.speed
+    speed = sim.bullet_speed
+    bw, bh = BULLET_IMGS["up"].get_size()
+    top0 = ship.top - bh // 2
+    k_max = _flight(speed, (0, top0), (bw, bh), (0, -1))
+    shots = []
+    for c in cannons:
+        dx, dy = c.vector
+        w, h = bullet_image(dx, dy)[1].get_size()
+        pos = (c.rect.centerx - w // 2, c.rect.centery - h // 2)
+        shots.append((pos, (w, h), (dx, dy), _flight(16, pos, (w, h), (dx, dy))))
+    k_max = max([k_max] + [s[3] for s in shots])
+
+    frames = span + k_max + 1
+    traj = np.empty((frames, len(ents), 4), np.int64)
+    traj[0] = [tuple(e.rect) for e in ents]
+    for f in range(1, frames):
+        for e in ents:
+            if hasattr(e, "update"):
+                e.update()
+        traj[f] = [tuple(e.rect) for e in ents]
+    ex, ey = traj[..., 0], traj[..., 1]
+    ex2, ey2 = ex + traj[..., 2], ey + traj[..., 3]
+
+    weights = 1 << np.arange(len(ents), dtype=np.int64)
+    steps = np.arange(span)
+    xs = np.array(sorted({*range(ship.x % step, WIDTH - ship.w + 1, step),
+                          0, WIDTH - ship.w}))
+    travel = -(-np.abs(xs - ship.x) // step)
+    bx = (xs + ship.w // 2 - bw // 2)[:, None, None]
+
+    player = np.zeros((len(xs), span), np.int64)
+    open_ = np.ones((len(xs), span), bool)
+    for k in range(1, k_max + 1):
+        t = steps + k
+        by = top0 - speed * k
+        if by + bh < 0:
+            break
+        vert = (by < ey2[t]) & (by + bh > ey[t])
+        over = (bx < ex2[t]) & (bx + bw > ex[t]) & vert
+        bits = over.astype(np.int64) @ weights
+        new = open_ & (bits != 0)
+        player[new] = bits[new]
+        open_ &= ~new
+
+    enemy = np.zeros(span, np.int64)
+    tw = weights[:len(targets)]
+    for (px, py), (w, h), (dx, dy), k_out in shots:
+        open_ = np.ones(span, bool)
+        for k in range(1, k_out):
+            t = steps + k
+            x, y = px + dx * 16 * k, py + dy * 16 * k
+            over = ((x < ex2[t, :len(targets)]) & (x + w > ex[t, :len(targets)]) &
+                    (y < ey2[t, :len(targets)]) & (y + h > ey[t, :len(targets)]))
+            bits = over.astype(np.int64) @ tw
+            new = open_ & (bits != 0)
+            enemy[new] |= bits[new]
+            open_ &= ~new
+
+    alive = sum(1 << i for i, t in enumerate(targets) if not t.dead)
+    useful = alive | sum(1 << i for i, e in enumerate(ents[len(targets):], len(targets))
+                         if getattr(e, "kind", "ammo") == "ammo")
+    seen, out = set(), []
+    for s in range(span):
+        ok = (travel <= s) & (((player[:, s] & useful) != 0) | ((enemy[s] & alive) != 0))
+        for i in np.flatnonzero(ok)[np.argsort(travel[ok], kind="stable")].tolist():
+            key = (int(player[i, s]), int(enemy[s]))
+            if key not in seen:
+                seen.add(key)
+                out.append((s, int(xs[i])))
+    return out
+
+def shoot(sim: Simulation, x: int, wait: int, dodge: int):
+    # anda ate x, espera, atira e segue desviando ate as balas sumirem.
+    # Devolve as acoes e a municao minima exigida nos frames sem bala no ar
+    plan = bytearray()
+    hp, need = sim.hp, 0
+
+    def act(a):
+        plan.append(a)
+        sim.step(a)
+
+    while sim.ship.rect.x != x:
+        act(LEFT if x < sim.ship.rect.x else RIGHT)
+        wait -= 1
+    idle = bytes(max(wait, 0))
+    plan += idle
+    run(sim, idle)
+    act(FIRE | dodge)
+    for _ in range(SETTLE):
+        if sim.hp < hp:
+            return None
+        if sim.done:
+            break
+        if not len(sim.bullets):
+            need = max(need, 1 + UNLIMITED - sim.lvl.ammo)
+            if not len(sim.enemy_bullets):
+                break
+        act(dodge)
+    if sim.hp < hp:
+        return None
+    return bytes(plan), need
+
+def expand(key, path, plan: bytes):
+    base = _replay(key, path, plan)
+    children = []
+    for wait, x in candidates(base, horizon(base)):
+        for dodge in DODGES:
+            sim = base.clone()
+            res = shoot(sim, x, wait, dodge)
+            if res is None:
+                continue
+            step, need = res
+            child = plan + step
+            if not sim.done:
+                _remember((key, child), sim.clone())
+            children.append((child, signature(sim), need, UNLIMITED - sim.lvl.ammo,
+                             sim.outcome is not None and sim.outcome[0] == "advance"))
+            break
+    return children
+
+def _expand(args):
+    return expand(*args)
+
+
+# ---- lado do coordenador: fronteira por numero de tiros, podando dominados ----
+
+def setup(path: pathlib.Path) -> str:
+    # o que a busca simula: a municao inicial nao entra (a busca usa UNLIMITED),
+    # entao fases que so diferem nela dividem memo e snapshots
+    return replace(load_template(path), ammo=UNLIMITED).digest().hex()
+
+def verify(path: pathlib.Path, plan: bytes, ammo: int) -> bool:
+    sim = Simulation(load_template(path).instantiate(0))
+    sim.lvl.ammo = ammo
+    for a in plan:
+        if sim.step(a) and sim.done:
+            break
+    return sim.outcome is not None and sim.outcome[0] == "advance"
+
+def shots_of(path: pathlib.Path, plan: bytes) -> list[tuple[int, int]]:
+    sim = Simulation(load_template(path).instantiate(0))
+    sim.lvl.ammo = UNLIMITED
+    shots = []
+    for a in plan:
+        if a & FIRE:
+            shots.append((sim.frame, sim.ship.rect.centerx))
+        sim.step(a)
+    return shots
+
+def solve_level(path: pathlib.Path, pool=None, memo: dict | None = None) -> dict:
+    started = time.perf_counter()
+    memo = {} if memo is None else memo
+    key = setup(path)
+    given = load_template(path).ammo
+    run = pool.map if pool else map
+
+    root = Simulation(load_template(path).instantiate(0))
+    # para cada estado, as combinacoes (exigida, gasta) ainda nao dominadas
+    fronts = {signature(root): [(1, 0)]}
+    layer = [(b"", 1, 0)]
+    best, expanded = None, 0
+    while layer:
+        todo = [n for n in layer if (key, n[0]) not in memo]
+        for n, children in zip(todo, run(_expand, [(key, str(path), n[0]) for n in todo])):
+            memo[key, n[0]] = children
+        expanded += len(todo)
+
+        nxt = []
+        for plan, p_need, _ in layer:
+            for child, sig, need, spent, won in memo[key, plan]:
+                need = max(need, p_need)
+                total = max(need, spent)
+                if best is not None and total >= best[0]:
+                    continue
+                if won:
+                    best = (total, child)
+                    continue
+                front = fronts.setdefault(sig, [])
+                if any(n <= need and s <= spent for n, s in front):
+                    continue
+                front[:] = [(n, s) for n, s in front if not (need <= n and spent <= s)]
+                front.append((need, spent))
+                nxt.append((child, need, spent, sig))
+        layer = [(c, n, s) for c, n, s, sig in nxt
+                 if (n, s) in fronts[sig] and (best is None or n < best[0])]
+
+    result = {"level": path.name, "ammo": given, "min_ammo": None, "shots": [],
+              "nodes": expanded, "seconds": 0.0}
+    if best is not None:
+        need, plan = best
+        # confirma na simulacao real, com a municao contada
+        if not verify(path, plan, UNLIMITED):
+            raise RuntimeError(f"{path.name}: plano encontrado nao vence a fase")
+        while not verify(path, plan, need):
+            need += 1
+        result["min_ammo"] = need
+        result["shots"] = shots_of(path, plan)
+    result["winnable"] = result["min_ammo"] is not None and result["min_ammo"] <= given
+    result["seconds"] = round(time.perf_counter() - started, 2)
+    return result
+
+def solve_all(dir_path: pathlib.Path = DATA, workers: int | None = None) -> list[dict]:
+    files = sorted(p for p in dir_path.iterdir() if p.suffix == ".json")
+    memo = {}
+    with ProcessPoolExecutor(workers or os.cpu_count()) as pool:
+        return [solve_level(p, pool, memo) for p in files]
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="menor municao que vence cada fase")
+    parser.add_argument("levels", nargs="?", type=pathlib.Path, default=DATA)
+    parser.add_argument("-j", "--workers", type=int, default=None)
+    parser.add_argument("--json", action="store_true")
+    args = parser.parse_args(argv)
+
+    results = solve_all(args.levels, args.workers)
+    if args.json:
+        print(json.dumps(results, indent=2))
+    else:
+        for r in results:
+            if r["min_ammo"] is None:
+                verdict = "impossivel"
+            elif r["winnable"]:
+                verdict = "ok"
+            else:
+                verdict = "municao insuficiente"
+            print(f"{r['level']:<10} ammo {r['ammo']:>2}  minimo {r['min_ammo'] if r['min_ammo'] is not None else '-':>2}"
+                  f"  {verdict:<22} {r['nodes']:>4} estados  {r['seconds']:6.2f}s")
+    return 0 if all(r["winnable"] for r in results) else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
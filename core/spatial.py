@@ -0,0 +1,140 @@
+import numpy as np
+import pygame
+
+CELL_SIZE = 64
+# abaixo disso pairs() testa caixa a caixa em vez de vetorizar
+SMALL_BATCH = 32
+_OFF = 1 << 20
+
+
+class SpatialHash:
+    def __init__(self, cell_size: int = CELL_SIZE):
+        self.cell_size = cell_size
+        self.cells: dict[tuple[int, int], list] = {}
+        self.spans: dict[object, tuple[int, int, int, int]] = {}
+        self.order: dict[object, int] = {}
+        self._seq = 0
+        self._version = 0
+        self._index = None
+
+    def __len__(self): return len(self.spans)
+
+    def __contains__(self, item): return item in self.spans
+
+    def _span(self, rect):
+        c = self.cell_size
+        return rect.left // c, rect.top // c, (rect.right - 1) // c, (rect.bottom - 1) // c
+
+    def update(self, item, rect):
+        span = self._span(rect)
+        old = self.spans.get(item)
+        if old == span:
+            return
+        if old is None:
+            self.order[item] = self._seq
+            self._seq += 1
+        else:
+            self._unlink(item, old)
+        self.spans[item] = span
+        self._version += 1
+        x0, y0, x1, y1 = span
+        for cx in range(x0, x1 + 1):
+            for cy in range(y0, y1 + 1):
+                self.cells.setdefault((cx, cy), []).append(item)
+
+    def remove(self, item):
+        span = self.spans.pop(item, None)
+        if span is not None:
+            self._unlink(item, span)
+            del self.order[item]
+
+    def _unlink(self, item, span):
+        self._version += 1
+        x0, y0, x1, y1 = span
+        for cx in range(x0, x1 + 1):
+            for cy in range(y0, y1 + 1):
+                cell = self.cells[cx, cy]
+                cell.remove(item)
+                if not cell:
+                    del self.cells[cx, cy]
+
+    def query(self, rect) -> list:
+        x0, y0, x1, y1 = self._span(rect)
+        cells = self.cells
+        if x0 == x1 and y0 == y1:
+            found = cells.get((x0, y0))
+            if not found:
+                return []
+            found = set(found)
+        else:
+            found = set()
+            for cx in range(x0, x1 + 1):
+                for cy in range(y0, y1 + 1):
+                    cell = cells.get((cx, cy))
+                    if cell:
+                        found.update(cell)
+        if len(found) < 2:
+            return list(found)
+        return sorted(found, key=self.order.__getitem__)
+
+
+    def _key(self, cx, cy):
+        return (cx + _OFF) * (2 * _OFF) + (cy + _OFF)
+
+    def _cell_index(self):
+        if self._index is None or self._index[0] != self._version:
+            items = sorted(self.spans, key=self.order.__getitem__)
+            keys, owners = [], []
+            for j, item in enumerate(items):
+                x0, y0, x1, y1 = self.spans[item]
+                for cx in range(x0, x1 + 1):
+                    for cy in range(y0, y1 + 1):
+                        keys.append(self._key(cx, cy))
+                        owners.append(j)
+            keys, owners = np.array(keys, np.int64), np.array(owners, np.int64)
+            srt = np.argsort(keys, kind="stable")
+            self._index = (self._version, items, keys[srt], owners[srt])
+        return self._index[1:]
+
+    def pairs(self, lo, hi) -> list[tuple[int, object]]:
+        # pares (indice da caixa, item) que se sobrepoem, em ordem de caixa e
+        # depois de insercao. lo/hi sao os cantos (n, 2) das caixas, que devem
+        # ser menores que uma celula.
+        n = len(lo)
+        if not n or not self.spans:
+            return []
+        if n < SMALL_BATCH:
+            out = []
+            for i, ((l, t), (r, b)) in enumerate(zip(lo.tolist(), hi.tolist())):
+                rect = pygame.Rect(l, t, r - l, b - t)
+                for item in self.query(rect):
+                    if rect.colliderect(item.rect):
+                        out.append((i, item))
+            return out
+
+        items, keys, owners = self._cell_index()
+        c = self.cell_size
+        lc, hc = lo // c, (hi - 1) // c
+        idx = np.arange(n)
+        bi, bk = [], []
+        for cx in (lc[:, 0], hc[:, 0]):
+            for cy in (lc[:, 1], hc[:, 1]):
+                bi.append(idx)
+                bk.append(self._key(cx, cy))
+        bi, bk = np.concatenate(bi), np.concatenate(bk)
+        first = np.searchsorted(keys, bk, "left")
+        cnt = np.searchsorted(keys, bk, "right") - first
+        hit = cnt > 0
+        bi, first, cnt = bi[hit], first[hit], cnt[hit]
+        if not len(bi):
+            return []
+        starts = np.repeat(first - (np.cumsum(cnt) - cnt), cnt)
+        pb = np.repeat(bi, cnt)
+        pe = owners[starts + np.arange(int(cnt.sum()))]
+
+        rects = np.array([tuple(item.rect) for item in items], np.int64)
+        elo = rects[pe, :2]
+        ehi = elo + rects[pe, 2:]
+        hit = ((lo[pb] < ehi) & (hi[pb] > elo)).all(axis=1)
+        pk = np.unique(pb[hit] * len(items) + pe[hit])
+        return list(zip((pk // len(items)).tolist(), map(items.__getitem__, (pk % len(items)).tolist())))
@@ -2,25 +2,35 @@ import sys
 import pygame
 from typing import Any
 
-from core.assets import load_bg, HEART, POWERUPS, CANNON_IMGS, DESTROYED_CANNON_IMGS, SHIP_IDLE, LOGO
-from core.level import Level, LevelManager
-from core.player import Spaceship
-from core.bullet import Bullet
-from core.powerup import PowerUp
-from core.score import save_score, load_scores, ScoreManager
+from core import assets
+from core.assets import POWERUPS, CANNON_IMGS, DESTROYED_CANNON_IMGS, LazyFont
+from core.level import LevelManager, LevelPrefetch
+from core.sim import Simulation, LEFT, RIGHT, FIRE, SKIP
+from core.replay import RECORDER, verify_async, archive
+from core.score import save_score, load_scores, ranked_scores, score_rank, WINDOWS, ScoreManager
+from core.text import render_text
+from core.render import DirtyRenderer
+from core.profiler import PROFILER
+from core.telemetry import TELEMETRY
 from settings import WIDTH, HEIGHT
 
-FONT_BIG = pygame.font.Font(None, 64)
-FONT_MID = pygame.font.Font(None, 48)
-FONT_SMALL = pygame.font.Font(None, 32)
-BACKGROUND = load_bg()
+FONT_BIG = LazyFont("FONT_BIG")
+FONT_MID = LazyFont("FONT_MID")
+FONT_SMALL = LazyFont("FONT_SMALL")
 STARTING_LEVEL = 0
 
 level_manager = LevelManager()
+level_prefetch = LevelPrefetch()
+VERIFIED = pygame.event.custom_type()     # conferencia do replay terminou (acorda a tela parada)
+
+def __getattr__(name):
+    if name == "BACKGROUND":
+        return assets.BACKGROUND
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 
 def write_centered(surf, font, text, y, color="white"):
-    img = font.render(text, True, color)
+    img = render_text(font, text, color)
     rect = img.get_rect(midtop=(surf.get_width() // 2, y))
     surf.blit(img, rect)
     return rect
@@ -38,15 +48,29 @@ class StateManager:
 
     def update(self, dt): self.state.update(dt)
 
-    def draw(self, surf): self.state.draw(surf)
+    def draw(self, surf, alpha=1.0):
+        # alpha: fracao do proximo passo de simulacao ja decorrida
+        self.state.alpha = alpha
+        return self.state.draw(surf)
+
+    def damage(self, rect):
+        renderer = getattr(self.state, "renderer", None)
+        if renderer is not None:
+            renderer.damage(rect)
 
     def change(self, state_id: str, data: Any = None):
         cls = self._registry[state_id]
+        TELEMETRY.transition(self.state.id if self.state else None, state_id,
+                             data.get("level") if isinstance(data, dict) else None)
         self.state = cls(self, data)
 
 
 class BaseState:
     id: str = "BASE"
+    alpha: float = 1.0
+    # tela parada: so muda com input, entao o main loop desenha uma vez e
+    # dorme em pygame.event.wait ate o proximo evento
+    idle: bool = False
 
     def __init__(self, mgr: StateManager, data: Any = None):
         self.mgr = mgr
@@ -64,13 +88,14 @@ def draw_multiline_centered(surf, font, text, top, color="white", line_spacing=1
     lines = text.split("\n")
     y = top
     for line in lines:
-        rendered = font.render(line, True, color)
+        rendered = render_text(font, line, color)
         rect = rendered.get_rect(midtop=(surf.get_width() // 2, y))
         surf.blit(rendered, rect)
         y += rendered.get_height() + line_spacing
 
 class InfoState(BaseState):
     id = "INFO"
+    idle = True
 
     def __init__(self, mgr, data=None):
         self.text = ""
@@ -90,6 +115,8 @@ class InfoState(BaseState):
         self.subtitle2 = data.get("subtitle2", "")
         self.next_state = data.get("next_state", "PLAY")
         self.next_data = data.get("next_data", {})
+        if self.next_state == "PLAY":
+            level_prefetch.start(level_manager, self.next_data["level"])
 
     def handle_event(self, e):
         if e.type == pygame.KEYDOWN and e.key == pygame.K_RETURN:
@@ -107,7 +134,7 @@ class InfoState(BaseState):
             rect1 = self.image1.get_rect(midtop=(WIDTH // 2, y))
             surf.blit(self.image1, rect1)
             y = rect1.bottom + 8
-            sub1 = FONT_SMALL.render(self.subtitle1, True, "white")
+            sub1 = render_text(FONT_SMALL, self.subtitle1)
             sub1_rect = sub1.get_rect(midtop=(WIDTH // 2, y))
             surf.blit(sub1, sub1_rect)
             y = sub1_rect.bottom + 24
@@ -116,7 +143,7 @@ class InfoState(BaseState):
             rect2 = self.image2.get_rect(midtop=(WIDTH // 2, y))
             surf.blit(self.image2, rect2)
             y = rect2.bottom + 8
-            sub2 = FONT_SMALL.render(self.subtitle2, True, "white")
+            sub2 = render_text(FONT_SMALL, self.subtitle2)
             sub2_rect = sub2.get_rect(midtop=(WIDTH // 2, y))
             surf.blit(sub2, sub2_rect)
             y = sub2_rect.bottom + 24
@@ -125,11 +152,12 @@ class InfoState(BaseState):
 
 class BootState(BaseState):
     id = "BOOT"
+    idle = True
 
     def __init__(self, mgr, data=None):
         self.options = ["Começar", "Ver ranking"]
         self.selected = 0
-        self.ship_img = SHIP_IDLE  
+        self.ship_img = assets.SHIP_IDLE  
         super().__init__(mgr, data)
 
     def handle_event(self, e):
@@ -145,9 +173,9 @@ class BootState(BaseState):
                 self.selected = (self.selected + 1) % len(self.options)
 
     def draw(self, surf):
-        surf.blit(BACKGROUND, (0, 0))
+        surf.blit(assets.BACKGROUND, (0, 0))
 
-        surf.blit(LOGO, (WIDTH // 2 - LOGO.get_width() // 2, 50))
+        surf.blit(assets.LOGO, (WIDTH // 2 - assets.LOGO.get_width() // 2, 50))
 
         ship_rect = self.ship_img.get_rect(center=(WIDTH // 2, HEIGHT // 2))
         surf.blit(self.ship_img, ship_rect)
@@ -166,147 +194,104 @@ class PlayState(BaseState):
     collected_hp_levels: set[int] = set()
 
     def __init__(self, mgr: StateManager, data: Any = None):
-        self.bullets: list[Bullet] = []
-        self.enemy_bullets: list[Bullet] = []
-        self.powerups: list[PowerUp] = []
-        self.ship: Spaceship | None = None
-        self.lvl: Level | None = None
-        self.hp: int = 3
-        self.bullet_speed: int = 16
+        self.sim: Simulation | None = None
+        self.renderer = DirtyRenderer(assets.BACKGROUND)
+        # posicoes antes do ultimo passo, pra interpolar o desenho
+        self._prev: list[tuple[int, int]] | None = None
+        self._moved = (0, 0)
         super().__init__(mgr, data)
 
     def enter(self, data):
-        self.hp = data.get("hp", 3)
-        self.bullet_speed = data.get("bullet_speed", 16)
-        self.lvl = level_manager.get_level(data["level"])
-        self.ship = Spaceship()
-        self.bullets = []
-        self.powerups = [
-            p for p in self.lvl.powerups
-            if not (p.kind == "hp" and self.lvl.idx in PlayState.collected_hp_levels)
-        ]
+        lvl = level_prefetch.take(level_manager, data["level"])
+        RECORDER.begin(lvl.idx, level_manager.template(lvl.idx).digest(),
+                       ScoreManager.not_used_bullets, PlayState.collected_hp_levels)
+        self.sim = Simulation(lvl, data.get("hp", 3), data.get("bullet_speed", 16),
+                              PlayState.collected_hp_levels)
 
     def handle_event(self, e):
         if e.type != pygame.KEYDOWN:
             return
 
         if e.key == pygame.K_p:
-            self.lvl.ammo = max(self.lvl.ammo - len(self.lvl.targets), 0)
-            self.advance()
+            RECORDER.event(SKIP)
+            self.apply(self.sim.skip())
             return
 
         if e.key == pygame.K_SPACE:
-            if self.lvl.ammo:
-                self.bullets.append(Bullet(self.ship.rect.centerx, self.ship.rect.top, speed=self.bullet_speed))
-                self.lvl.ammo -= 1
-                for cannon in self.lvl.cannons:
-                    bullet = cannon.fire()
-                    if bullet:
-                        self.enemy_bullets.append(bullet)  
+            RECORDER.event(FIRE)
+            self.apply(self.sim.fire())
 
+    def positions(self):
+        sim = self.sim
+        return [sim.ship.rect.topleft, *(t.rect.topleft for t in sim.lvl.targets),
+                *(p.rect.topleft for p in sim.powerups)]
 
     def update(self, dt):
+        self._prev = self.positions()
         keys = pygame.key.get_pressed()
-        self.ship.update(keys)
-
-        for t in self.lvl.targets:
-            t.update() 
-
-        for b in self.bullets:
-            b.update()
-
-        for p in self.powerups:
-            p.update()
-
-        for b in self.bullets:
-            for t in self.lvl.targets:
-                if b.rect.colliderect(t.rect):
-                    if not t.dead:
-                        t.hit()
-                    b.active = False
-            for c in self.lvl.cannons:
-                if c.active and b.rect.colliderect(c.rect):
-                    c.hit()
-                    b.active = False
-
-        for b in self.bullets:
-            if not b.active:
-                continue
-            for p in self.powerups:
-                if not p.collected and b.rect.colliderect(p.rect):
-                    self.apply_power_up(p.kind, p.value)
-                    p.collect()
-                    b.active = False
-
-        self.bullets = [b for b in self.bullets if b.active]
-
-        for b in self.enemy_bullets:
-            b.update()
-        self.enemy_bullets = [b for b in self.enemy_bullets if b.active]
-
-        for b in self.enemy_bullets:
-            if b.rect.colliderect(self.ship.rect):
-                b.active = False
-                self.hp -= 1
-                if self.hp:
-                    self.mgr.change("LOSE", {"level": self.lvl.idx, "hp": self.hp})
-                else:
-                    self.mgr.change("GLOBAL_LOSE", {"level": self.lvl.idx})
-
-        for b in self.enemy_bullets:
-            for t in self.lvl.targets:
-                if b.rect.colliderect(t.rect):
-                    t.hit()
-                    b.active = False
-            for c in self.lvl.cannons:
-                if c.active and b.rect.colliderect(c.rect):
-                    if b.source != "cannon":
-                        c.hit()
-                        b.active = False
-
-        if self.lvl.ammo == 0 and len(self.bullets) == 0:
-            self.hp -= 1
-            if self.hp >= 0:
-                self.mgr.change("LOSE", {"level": self.lvl.idx, "hp": self.hp})
-            else:
-                self.mgr.change("GLOBAL_LOSE", {"level": self.lvl.idx})
-
-        if all(t.dead for t in self.lvl.targets):
-            self.advance()
+        RECORDER.frame(LEFT * keys[pygame.K_LEFT] | RIGHT * keys[pygame.K_RIGHT])
+        self.apply(self.sim.update(keys))
+        # balas criadas depois deste passo ainda nao andaram: nao interpolam
+        self._moved = (len(self.sim.bullets), len(self.sim.enemy_bullets))
+
+    def apply(self, outcomes):
+        if outcomes:
+            # vale o ultimo resultado, como a troca de estado abaixo
+            TELEMETRY.attempt(self.sim, outcomes[-1][0])
+        for kind, hp in outcomes:
+            match kind:
+                case "lose":
+                    self.mgr.change("LOSE", {"level": self.sim.lvl.idx, "hp": hp})
+                case "global_lose":
+                    self.mgr.change("GLOBAL_LOSE", {"level": self.sim.lvl.idx})
+                case "advance":
+                    self.advance()
 
     def advance(self):
-        ScoreManager.not_used_bullets += self.lvl.ammo
-        if self.lvl.idx + 1 < level_manager.count:
-            self.mgr.change("WIN", {"next": self.lvl.idx + 1, "hp": self.hp})
+        ScoreManager.not_used_bullets += self.sim.lvl.ammo
+        if self.sim.lvl.idx + 1 < level_manager.count:
+            self.mgr.change("WIN", {"next": self.sim.lvl.idx + 1, "hp": self.sim.hp})
         else:
-            self.mgr.change("FIN", {"score": ScoreManager.get_score(self.hp)})
+            self.mgr.change("FIN", {"score": ScoreManager.get_score(self.sim.hp)})
 
     def draw(self, surf):
-        surf.blit(BACKGROUND, (0, 0))
-        write_centered(surf, FONT_MID, f"fase {self.lvl.idx + 1}/{level_manager.count}", 10)
-        self.ship.draw(surf)
-        for t in self.lvl.targets: t.draw(surf)
-        for p in self.powerups: p.draw(surf)
-        for b in self.bullets: b.draw(surf)
-        for c in self.lvl.cannons: c.draw(surf)
-        for b in self.enemy_bullets: b.draw(surf)
-
-        surf.blit(FONT_MID.render(f"x{self.lvl.ammo}", True, "YELLOW"),
-                  (25, HEIGHT - 64))
-        for i in range(self.hp):
-            surf.blit(HEART, (WIDTH - 15 - (i+1) * 50, HEIGHT - 68))
-
-    def apply_power_up(self, kind: str, value: int):
-        match kind:
-            case "hp":
-                if self.lvl.idx not in PlayState.collected_hp_levels:
-                    PlayState.collected_hp_levels.add(self.lvl.idx)
-                self.hp = min(self.hp + value, 5)
-            case "ammo":
-                self.lvl.ammo += value
+        t0 = PROFILER.mark()
+        sim = self.sim
+        lag = 1 - self.alpha if self._prev is not None else 0.0
+        prev = self._prev
+
+        def at(i, rect):
+            if not lag:
+                return rect
+            px, py = prev[i]
+            return rect.move(round((px - rect.x) * lag), round((py - rect.y) * lag))
+
+        # o que esta parado vai pra camada estatica do renderer (so e refeita
+        # quando muda); o resto e desenhado por cima a cada frame
+        title = render_text(FONT_MID, f"fase {sim.lvl.idx + 1}/{level_manager.count}")
+        static = [(title, title.get_rect(midtop=(WIDTH // 2, 10)))]
+        static += [(t.image, t.rect) for t in sim.lvl.targets if t.dead or not t.movement]
+        static += [(p.image, p.rect) for p in sim.powerups if not p.collected and not p.movement]
+        static += [(c.image, c.rect) for c in sim.lvl.cannons]
+
+        n_tg = len(sim.lvl.targets)
+        sprites = [(sim.ship.image, at(0, sim.ship.rect))]
+        sprites += [(t.image, at(1 + i, t.rect)) for i, t in enumerate(sim.lvl.targets)
+                    if t.movement and not t.dead]
+        sprites += [(p.image, at(1 + n_tg + i, p.rect)) for i, p in enumerate(sim.powerups)
+                    if p.movement and not p.collected]
+        sprites += sim.bullets.sprites(lag, self._moved[0])
+        sprites += sim.enemy_bullets.sprites(lag, self._moved[1])
+        sprites.append((render_text(FONT_MID, f"x{sim.lvl.ammo}", "YELLOW"), (25, HEIGHT - 64)))
+        sprites += [(assets.HEART, (WIDTH - 15 - (i+1) * 50, HEIGHT - 68)) for i in range(sim.hp)]
+        t0 = PROFILER.lap("sprites", t0)
+        dirty = self.renderer.render(surf, sprites, static)
+        PROFILER.lap("blit", t0)
+        return dirty
 
 class WinState(BaseState):
     id = "WIN"
+    idle = True
 
     def __init__(self, mgr: StateManager, data: Any = None):
         self.next_lvl: int | None = None
@@ -316,6 +301,7 @@ class WinState(BaseState):
     def enter(self, data):
         self.next_lvl = data["next"]
         self.hp = data.get("hp", 3)
+        level_prefetch.start(level_manager, self.next_lvl)
 
     def handle_event(self, e):
         if e.type == pygame.KEYDOWN and e.key in (pygame.K_RETURN, pygame.K_KP_ENTER):
@@ -350,6 +336,7 @@ class WinState(BaseState):
 
 class LoseState(BaseState):
     id = "LOSE"
+    idle = True
 
     def __init__(self, mgr: StateManager, data: Any = None):
         self.lvl_file: int | None = None
@@ -359,6 +346,7 @@ class LoseState(BaseState):
     def enter(self, data):
         self.lvl_file = data["level"]
         self.nxt_hp = data["hp"]
+        level_prefetch.start(level_manager, self.lvl_file)
 
     def handle_event(self, e):
         if e.type != pygame.KEYDOWN: return
@@ -376,6 +364,7 @@ class LoseState(BaseState):
 
 class GlobalLoseState(BaseState):
     id = "GLOBAL_LOSE"
+    idle = True
 
     def __init__(self, mgr: StateManager, data: Any = None):
         self.lvl_file = None
@@ -383,6 +372,7 @@ class GlobalLoseState(BaseState):
 
     def enter(self, data):
         self.lvl_file = data["level"]
+        level_prefetch.start(level_manager, STARTING_LEVEL)
 
     def handle_event(self, e):
         if e.type != pygame.KEYDOWN: return
@@ -397,14 +387,19 @@ class GlobalLoseState(BaseState):
         write_centered(surf, FONT_BIG, "Sem vidas!", HEIGHT // 2 - 150)
         write_centered(surf, FONT_SMALL, "ENTER = recomeçar | ESC = sair", HEIGHT // 2 - 100)
 
+WINDOW_NAMES = {"all": "GERAL", "week": "SEMANA", "day": "HOJE"}
+
 class RankingState(BaseState):
     id = "RANKING"
+    idle = True
 
     def __init__(self, mgr: StateManager, data: Any = None):
         self.scores = []
+        self.window = "all"
         super().__init__(mgr, data)
 
     def enter(self, data: Any = None):
+        self.window = "all"
         self.scores = load_scores()
 
     def handle_event(self, e):
@@ -413,36 +408,69 @@ class RankingState(BaseState):
                 pygame.quit(); sys.exit()
             elif e.key in (pygame.K_RETURN, pygame.K_KP_ENTER, pygame.K_BACKSPACE):
                 self.mgr.change("BOOT")
+            elif e.key in (pygame.K_LEFT, pygame.K_RIGHT):
+                step = 1 if e.key == pygame.K_RIGHT else -1
+                self.window = WINDOWS[(WINDOWS.index(self.window) + step) % len(WINDOWS)]
+                self.scores = ranked_scores(1, 10, self.window)
 
     def draw(self, surf):
         surf.fill("black")
         write_centered(surf, FONT_BIG, "LEADERBOARD", 80)
+        write_centered(surf, FONT_SMALL, f"< {WINDOW_NAMES[self.window]} >", 130)
 
-        y = 160
+        y = 175
         for i, s in enumerate(self.scores[:10], 1):
             txt = f"{i:2d}. {s['name']:<10} {s['score']:>5}"
             write_centered(surf, FONT_SMALL, txt, y)
             y += 35
 
-        write_centered(surf, FONT_SMALL, "ENTER = voltar", HEIGHT - 60)
+        write_centered(surf, FONT_SMALL, "Setas = periodo | ENTER = voltar", HEIGHT - 60)
 
 
 class FinishedState(BaseState):
     id = "FIN"
+    idle = True
 
     def __init__(self, mgr: StateManager, data: Any = None):
         self.score: int = 0
         self.name: str = ""
         self.saved: bool = False
+        self.rank: int = 0
+        self.rejected: bool = False
+        self.submitting: bool = False
         self.scores: list[dict] = []
         super().__init__(mgr, data)
 
     def enter(self, data: dict):
         self.score  = data.get("score", 0)
         self.scores = load_scores()
+        # o replay ja e conferido enquanto o jogador digita o nome
+        self.recording = RECORDER.finish(self.score)
+        self.check = verify_async(self.recording, self.score, level_manager, STARTING_LEVEL)
+        self.check.add_done_callback(lambda _: pygame.event.post(pygame.event.Event(VERIFIED)))
+
+    def submit(self):
+        # so entra no ranking o score que o replay da sessao reproduz
+        if not self.submitting or self.saved or not self.check.done():
+            return
+        try:
+            ok = self.check.result()
+        except Exception:
+            ok = False
+        if ok:
+            self.rank   = score_rank(self.score)
+            self.scores = save_score(self.name or "ANON", self.score)
+            archive(self.recording, self.name)
+        else:
+            self.rejected = True
+            self.scores = load_scores()
+        self.saved  = True
 
     def handle_event(self, e):
-        if e.type != pygame.KEYDOWN:
+        if e.type == VERIFIED:
+            self.submit()
+            return
+        if e.type != pygame.KEYDOWN or (self.submitting and not self.saved):
             return
 
         if self.saved:
@@ -456,8 +484,8 @@ class FinishedState(BaseState):
         if e.key == pygame.K_BACKSPACE:
             self.name = self.name[:-1]
         elif e.key in (pygame.K_RETURN, pygame.K_KP_ENTER):
-            self.scores = save_score(self.name or "ANON", self.score)
-            self.saved  = True
+            self.submitting = True
+            self.submit()
         elif len(self.name) < 10 and e.unicode.isprintable():
             self.name += e.unicode.upper()
 
@@ -468,11 +496,17 @@ class FinishedState(BaseState):
 
         if not self.saved:
             write_centered(surf, FONT_MID, "Digite seu nome:", y); y += 50
-            write_centered(surf, FONT_MID, self.name + "_", y)
+            write_centered(surf, FONT_MID, self.name + ("" if self.submitting else "_"), y)
+            if self.submitting:
+                write_centered(surf, FONT_SMALL, "Conferindo replay...", y + 60)
         else:
             write_centered(surf, FONT_MID, "LEADERBOARD", y); y += 50
             for i, s in enumerate(self.scores, 1):
                 txt = f"{i:2d}. {s['name']:<10} {s['score']:>5}"
                 write_centered(surf, FONT_SMALL, txt, y); y += 35
+            if self.rejected:
+                write_centered(surf, FONT_SMALL, "Score nao confere com o replay", y, "red")
+            else:
+                write_centered(surf, FONT_SMALL, f"Sua posicao: {self.rank}", y)
             y += 40
             write_centered(surf, FONT_SMALL, "ENTER = jogar de novo   |   ESC = sair", y)
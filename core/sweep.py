@@ -0,0 +1,40 @@
+import numpy as np
+
+# colisao continua entre caixas que andam em linha reta durante um passo.
+# Caixas em (n, 2) inteiros: canto superior esquerdo antes/depois e tamanho.
+# A sobreposicao e estrita como em Rect.colliderect: encostar na borda nao conta.
+
+
+def contact_times(lo0, lo1, size, elo0, elo1, esize) -> np.ndarray:
+    # (n, m): instante em [0, 1] do primeiro contato de cada caixa movel com
+    # cada entidade (0 = ja comecam sobrepostas), inf se nao se encostam
+    lo0, lo1, elo0, elo1 = (np.asarray(a, np.int64).reshape(-1, 2) for a in (lo0, lo1, elo0, elo1))
+    size, esize = np.asarray(size, np.int64).reshape(-1, 2), np.asarray(esize, np.int64).reshape(-1, 2)
+    # movimento relativo: a entidade fica parada e a caixa anda d
+    d = ((lo1 - lo0)[:, None] - (elo1 - elo0)[None]).astype(np.float64)
+    near = (elo0[None] - (lo0 + size)[:, None]).astype(np.float64)   # precisa d*t > near
+    far = ((elo0 + esize)[None] - lo0[:, None]).astype(np.float64)   # precisa d*t < far
+    still = (near < 0) & (far > 0)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        a, b = near / d, far / d
+    enter = np.where(d > 0, a, np.where(d < 0, b, np.where(still, -np.inf, np.inf)))
+    leave = np.where(d > 0, b, np.where(d < 0, a, np.where(still, np.inf, -np.inf)))
+    enter, leave = enter.max(axis=2), leave.min(axis=2)
+    t = np.maximum(enter, 0.0)
+    return np.where(t < np.minimum(leave, 1.0), t, np.inf)
+
+
+def contacts(times: np.ndarray) -> list[tuple[int, int, float]]:
+    # todos os contatos (caixa, entidade, t), por caixa e depois por instante
+    i, j = np.nonzero(np.isfinite(times))
+    if not len(i):
+        return []
+    t = times[i, j]
+    order = np.lexsort((j, t, i))
+    return list(zip(i[order].tolist(), j[order].tolist(), t[order].tolist()))
+
+
+def sweep(lo0, lo1, size, elo0, elo1, esize) -> list[tuple[int, int, float]]:
+    if not len(lo0) or not len(elo0):
+        return []
+    return contacts(contact_times(lo0, lo1, size, elo0, elo1, esize))
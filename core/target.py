@@ -1,8 +1,8 @@
-from core.assets import ACTIVE_TARGET, DESTROYED_TGT
+from core import assets
 
 class Target:
     def __init__(self, x, y, movement=None):
-        self.image = ACTIVE_TARGET
+        self.image = assets.ACTIVE_TARGET
         self.rect = self.image.get_rect(topleft=(x, y))
         self.dead = False
 
@@ -17,23 +17,27 @@ class Target:
     def hit(self):
         if not self.dead:
             self.dead = True
-            self.image = DESTROYED_TGT
+            self.image = assets.DESTROYED_TGT
 
     def draw(self, surf):
         surf.blit(self.image, self.rect)
 
-    def update(self):
+    def update(self, frames=1):
         if self.dead or not self.movement:
             return
 
-        self.progress += self.direction * self.speed
-
-        if self.progress >= 1:
-            self.progress = 1
-            self.direction = -1
-        elif self.progress <= 0:
-            self.progress = 0
-            self.direction = 1
+        # frames > 1 anda varios passos de uma vez, com a mesma conta de cada passo
+        progress, direction = self.progress, self.direction
+        for _ in range(frames):
+            progress += direction * self.speed
+
+            if progress >= 1:
+                progress = 1
+                direction = -1
+            elif progress <= 0:
+                progress = 0
+                direction = 1
+        self.progress, self.direction = progress, direction
 
         x = self.lerp(self.start[0], self.end[0], self.progress)
         y = self.lerp(self.start[1], self.end[1], self.progress)
@@ -0,0 +1,215 @@
+import argparse, atexit, sqlite3, sys, threading, time, uuid
+
+from settings import SIM_HZ
+
+TELEMETRY_DB = "telemetry.db"
+CAPACITY = 4096     # eventos no buffer; cheio, o evento novo e descartado
+BATCH = 512         # eventos por transacao
+INTERVAL = 0.5      # segundos entre drenagens
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS transitions (
+    id      INTEGER PRIMARY KEY,
+    session TEXT    NOT NULL,
+    ts      REAL    NOT NULL,
+    src     TEXT,
+    dst     TEXT    NOT NULL,
+    level   INTEGER
+);
+CREATE TABLE IF NOT EXISTS attempts (
+    id            INTEGER PRIMARY KEY,
+    session       TEXT    NOT NULL,
+    ts            REAL    NOT NULL,
+    level         INTEGER NOT NULL,
+    outcome       TEXT    NOT NULL,
+    cause         TEXT,
+    hp            INTEGER NOT NULL,
+    shots         INTEGER NOT NULL,
+    ammo_left     INTEGER NOT NULL,
+    frames        INTEGER NOT NULL,
+    hp_powerups   INTEGER NOT NULL,
+    ammo_powerups INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS attempts_level ON attempts (level);
+CREATE TABLE IF NOT EXISTS drops (session TEXT PRIMARY KEY, dropped INTEGER NOT NULL);
+"""
+
+INSERTS = {
+    "transitions": "INSERT INTO transitions (session, ts, src, dst, level) VALUES (?, ?, ?, ?, ?)",
+    "attempts": "INSERT INTO attempts (session, ts, level, outcome, cause, hp, shots, ammo_left, "
+                "frames, hp_powerups, ammo_powerups) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+}
+
+def _connect(path):
+    db = sqlite3.connect(path, timeout=10, isolation_level=None)
+    db.execute("PRAGMA journal_mode=WAL")
+    db.execute("PRAGMA synchronous=NORMAL")
+    db.executescript(SCHEMA)
+    return db
+
+
+class Ring:
+    # fila circular de tamanho fixo com um produtor (o loop do jogo) e um
+    # consumidor (a thread de gravacao). Cada lado so escreve no proprio
+    # indice, entao nenhum dos dois trava; cheia, put descarta e conta
+    def __init__(self, capacity: int = CAPACITY):
+        self.capacity = capacity
+        self.dropped = 0
+        self._slots: list = [None] * capacity
+        self._head = 0      # proximo a escrever (so o produtor mexe)
+        self._tail = 0      # proximo a ler (so o consumidor mexe)
+
+    def __len__(self): return self._head - self._tail
+
+    def put(self, item) -> bool:
+        head = self._head
+        if head - self._tail >= self.capacity:
+            self.dropped += 1
+            return False
+        self._slots[head % self.capacity] = item
+        self._head = head + 1
+        return True
+
+    def take(self, limit: int) -> list:
+        tail, cap = self._tail, self.capacity
+        n = min(self._head - tail, limit)
+        out = []
+        for i in range(tail, tail + n):
+            out.append(self._slots[i % cap])
+            self._slots[i % cap] = None
+        self._tail = tail + n
+        return out
+
+
+class Telemetry:
+    # estatisticas por fase vindas do PlayState e do StateManager. O jogo so
+    # poe tuplas no Ring; uma thread esvazia em lotes no SQLite
+    def __init__(self, path: str = TELEMETRY_DB, capacity: int = CAPACITY):
+        self.path = path
+        self.enabled = True
+        self.session = uuid.uuid4().hex
+        self.ring = Ring(capacity)
+        self.written = 0
+        self.failed = 0
+        self._saved_drops = 0
+        self._lock = threading.Lock()      # segura enquanto um lote e gravado
+        self._wake = threading.Event()
+        self._writer: threading.Thread | None = None
+
+    def _emit(self, table: str, row: tuple):
+        if not self.enabled:
+            return
+        self.ring.put((table, row))
+        if self._writer is None:
+            self._writer = threading.Thread(target=self._write_loop, name="telemetry", daemon=True)
+            self._writer.start()
+            atexit.register(self.flush)
+
+    def transition(self, src: str | None, dst: str, level: int | None):
+        self._emit("transitions", (time.time(), src, dst, level))
+
+    def attempt(self, sim, outcome: str):
+        self._emit("attempts", (time.time(), sim.lvl.idx, outcome, sim.cause, sim.hp, sim.shots,
+                                sim.lvl.ammo, sim.frame, sim.taken["hp"], sim.taken["ammo"]))
+
+    def stats(self) -> dict:
+        return {"queued": len(self.ring), "written": self.written,
+                "dropped": self.ring.dropped, "failed": self.failed}
+
+    def flush(self, timeout: float = 2.0):
+        # fim do jogo: acorda a thread e espera o buffer esvaziar
+        deadline = time.monotonic() + timeout
+        while ((len(self.ring) or self.ring.dropped != self._saved_drops)
+               and self._writer is not None and time.monotonic() < deadline):
+            self._wake.set()
+            time.sleep(0.01)
+        if self._lock.acquire(timeout=max(deadline - time.monotonic(), 0)):
+            self._lock.release()
+
+    def _write_loop(self):
+        try:
+            db = _connect(self.path)
+        except sqlite3.Error as e:
+            print(f"telemetria desligada: {e}")
+            self.enabled = False
+            return
+        while True:
+            self._wake.wait(INTERVAL)
+            self._wake.clear()
+            with self._lock:
+                self._drain(db)
+
+    def _drain(self, db):
+        while True:
+            batch = self.ring.take(BATCH)
+            dropped = self.ring.dropped
+            if not batch and dropped == self._saved_drops:
+                return
+            rows = {table: [] for table in INSERTS}
+            for table, row in batch:
+                rows[table].append((self.session, *row))
+            try:
+                db.execute("BEGIN")
+                for table, values in rows.items():
+                    if values:
+                        db.executemany(INSERTS[table], values)
+                db.execute("INSERT INTO drops VALUES (?, ?) ON CONFLICT (session) "
+                           "DO UPDATE SET dropped = excluded.dropped", (self.session, dropped))
+                db.execute("COMMIT")
+                self.written += len(batch)
+                self._saved_drops = dropped
+            except sqlite3.Error as e:
+                if db.in_transaction:
+                    db.execute("ROLLBACK")
+                self.failed += len(batch)
+                print(f"telemetria nao gravada: {e}")
+                return
+
+
+TELEMETRY = Telemetry()
+
+
+REPORT = """
+SELECT level, COUNT(*), SUM(shots), AVG(ammo_left),
+       SUM(cause = 'bullet'), SUM(cause = 'ammo'),
+       AVG(CASE WHEN outcome = 'advance' THEN frames END),
+       SUM(hp_powerups), SUM(ammo_powerups)
+FROM attempts GROUP BY level ORDER BY level
+"""
+
+def report(path: str = TELEMETRY_DB) -> tuple[list[dict], int]:
+    db = _connect(path)
+    try:
+        entered = dict(db.execute("SELECT level, COUNT(*) FROM transitions "
+                                  "WHERE dst = 'PLAY' GROUP BY level").fetchall())
+        rows = []
+        for level, ended, shots, ammo, bullet, out, frames, hp, ammo_ups in db.execute(REPORT):
+            rows.append({"level": level, "attempts": max(entered.get(level, 0), ended), "ended": ended,
+                         "shots": shots, "ammo_left": round(ammo, 1),
+                         "deaths_bullet": bullet, "deaths_ammo": out,
+                         "clear_s": None if frames is None else round(frames / SIM_HZ, 1),
+                         "hp_powerups": hp, "ammo_powerups": ammo_ups})
+        dropped = db.execute("SELECT COALESCE(SUM(dropped), 0) FROM drops").fetchone()[0]
+    finally:
+        db.close()
+    return rows, dropped
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="resume a telemetria gravada por fase")
+    parser.add_argument("db", nargs="?", default=TELEMETRY_DB)
+    args = parser.parse_args(argv)
+
+    rows, dropped = report(args.db)
+    print(f"{'fase':>4} {'tent.':>6} {'tiros':>6} {'sobra':>6} {'m.bala':>6} {'m.mun.':>6} "
+          f"{'limpa s':>8} {'hp+':>4} {'mun+':>4}")
+    for r in rows:
+        clear = "-" if r["clear_s"] is None else f"{r['clear_s']:.1f}"
+        print(f"{r['level'] + 1:>4} {r['attempts']:>6} {r['shots']:>6} {r['ammo_left']:>6} "
+              f"{r['deaths_bullet']:>6} {r['deaths_ammo']:>6} {clear:>8} "
+              f"{r['hp_powerups']:>4} {r['ammo_powerups']:>4}")
+    print(f"eventos descartados (buffer cheio): {dropped}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,44 @@
+from collections import OrderedDict
+
+import pygame
+
+MAX_TEXTS = 256
+
+
+class TextCache:
+    # superficies de texto ja rasterizadas, com descarte LRU
+    def __init__(self, maxsize: int = MAX_TEXTS):
+        self.maxsize = maxsize
+        self._surfs: OrderedDict[tuple, pygame.Surface] = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self): return len(self._surfs)
+
+    def render(self, font: pygame.font.Font, text: str, color="white", antialias: bool = True) -> pygame.Surface:
+        key = (font, text, color if isinstance(color, str) else tuple(color), antialias)
+        surf = self._surfs.get(key)
+        if surf is not None:
+            self.hits += 1
+            self._surfs.move_to_end(key)
+            return surf
+        self.misses += 1
+        surf = self._surfs[key] = font.render(text, antialias, color)
+        if len(self._surfs) > self.maxsize:
+            self._surfs.popitem(last=False)
+            self.evictions += 1
+        return surf
+
+    def clear(self):
+        self._surfs.clear()
+
+    def stats(self) -> dict:
+        return {"size": len(self._surfs), "maxsize": self.maxsize, "hits": self.hits,
+                "misses": self.misses, "evictions": self.evictions}
+
+
+TEXT_CACHE = TextCache()
+
+def render_text(font, text, color="white", antialias=True) -> pygame.Surface:
+    return TEXT_CACHE.render(font, text, color, antialias)
@@ -1,25 +1,91 @@
 import pygame, sys
-from settings import WIDTH, HEIGHT, FPS
+from settings import WIDTH, HEIGHT, FPS, SIM_HZ
 
 pygame.init()
 screen = pygame.display.set_mode((WIDTH, HEIGHT), pygame.SCALED)
 clock  = pygame.time.Clock()
 
+from core import states
 from core.states import StateManager
+from core.profiler import PROFILER
+from core.assets import LazyFont
+# --levels=diretorio|arquivo.pack troca a origem das fases
+levels = next((a.split("=", 1)[1] for a in sys.argv if a.startswith("--levels=")), None)
+if levels is not None:
+    from core.level import open_levels
+    states.level_manager = open_levels(levels)
+# --no-telemetry desliga as estatisticas por fase (telemetry.db)
+if "--no-telemetry" in sys.argv:
+    from core.telemetry import TELEMETRY
+    TELEMETRY.enabled = False
+# rankings montados em segundo plano desde ja, pra nao travar a tela de ranking
+from core.score import STORE
+STORE.preload()
 mgr = StateManager("BOOT")
 
+# --profile liga o overlay (F3 alterna); --trace=arquivo.json|.csv exporta ao sair
+trace = next((a.split("=", 1)[1] for a in sys.argv if a.startswith("--trace=")), None)
+PROFILER.enabled = "--profile" in sys.argv or trace is not None
+PROFILER.overlay = "--profile" in sys.argv
+overlay_font = LazyFont("FONT_TINY")
+
+# passo fixo: a simulacao anda sempre SIM_HZ vezes por segundo, nao importa a
+# taxa de desenho; o que sobra no acumulador vira interpolacao no draw
+STEP = 1 / SIM_HZ
+MAX_LAG = 0.25   # atraso maximo recuperado de uma vez (evita espiral em travadas longas)
+lag = 0.0
+shown = None     # ultimo estado desenhado
+
 running = True
 while running:
-    dt = clock.tick(FPS) / 1000
-    for e in pygame.event.get():
-        if e.type == pygame.QUIT:
-            running = False
-        else:
-            mgr.handle_event(e)
-
-    mgr.update(dt)
-    mgr.draw(screen)
-    pygame.display.flip()
+    if mgr.state.idle and shown is mgr.state:
+        # tela parada ja desenhada: dorme ate chegar input ou timer
+        with PROFILER.phase("idle"):
+            events = [pygame.event.wait()]
+        events += pygame.event.get()
+        clock.tick()     # o tempo dormindo nao vira passos de simulacao
+        lag = 0.0
+    else:
+        lag = min(lag + clock.tick(FPS) / 1000, MAX_LAG)
+        events = pygame.event.get()
+
+    with PROFILER.phase("events"):
+        for e in events:
+            if e.type == pygame.QUIT:
+                running = False
+            elif e.type == pygame.KEYDOWN and e.key == pygame.K_F3 and PROFILER.enabled:
+                PROFILER.overlay = not PROFILER.overlay
+            else:
+                mgr.handle_event(e)
+
+    with PROFILER.phase("update"):
+        while lag >= STEP:
+            mgr.update(STEP)
+            lag -= STEP
+
+    with PROFILER.phase("draw"):
+        dirty = mgr.draw(screen, lag / STEP)
+        # o overlay e pintado por cima; o renderer refaz essa area no frame seguinte
+        if PROFILER.overlay:
+            box = PROFILER.draw_overlay(screen, overlay_font)
+            mgr.damage(box)
+            if dirty is not None:
+                dirty.append(box)
+
+    with PROFILER.phase("flip"):
+        if dirty is None:
+            pygame.display.flip()
+        elif dirty:
+            pygame.display.update(dirty)
+    shown = mgr.state
+    PROFILER.end_frame()
+
+if trace:
+    PROFILER.export(trace)
+
+if "--asset-report" in sys.argv:
+    from core import assets
+    print(assets.REGISTRY.report())
 
 pygame.quit()
 sys.exit()
@@ -1,2 +1,3 @@
 WIDTH, HEIGHT = 512, 768
-FPS = 30
+FPS = 60       # taxa de desenho
+SIM_HZ = 30    # passos de simulacao por segundo (define a velocidade do jogo)
@@ -0,0 +1,42 @@
+import sqlite3, time
+
+from core import score
+from core.score import ScoreStore, WINDOWS, _connect
+
+
+def _store(tmp_path):
+    store = ScoreStore(str(tmp_path / "scores.db"), str(tmp_path / "scores.json"))
+    store.preload()
+    store._loader.join()
+    return store
+
+
+def test_rollover_reload_keeps_rows_in_every_board(tmp_path):
+    store = _store(tmp_path)
+    other = _connect(store.path)
+    other.execute("INSERT INTO scores (name, score, ts) VALUES ('A', 100, ?)", (time.time(),))
+    assert [r["score"] for r in store.load()] == [100]     # cursor do jogo anda ate aqui
+
+    # outro gabinete grava depois do ultimo refresh e antes da virada do dia
+    other.execute("INSERT INTO scores (name, score, ts) VALUES ('B', 999, ?)", (time.time(),))
+    store.boards["day"].since -= 86400
+    store._start_load(["day"])
+    store._loader.join()
+
+    for window in WINDOWS:
+        assert [r["score"] for r in store.load(window)] == [999, 100], window
+    other.close()
+
+
+
+def test_permanent_write_error_drops_score_without_retrying(tmp_path, monkeypatch):
+    store = _store(tmp_path)
+    store.load()
+    # o writer abre o banco so pra leitura: "attempt to write a readonly database"
+    readonly = lambda path: sqlite3.connect(f"file:{path}?mode=ro", uri=True, isolation_level=None)
+    monkeypatch.setattr(score, "_connect", readonly)
+    store.save("B", 200)
+    start = time.perf_counter()
+    store.flush()
+    assert time.perf_counter() - start < 1
+    assert store._pending == []